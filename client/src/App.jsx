@@ -2,6 +2,7 @@ import React, { useRef, useEffect, useState } from 'react';
 import mapboxgl from 'mapbox-gl';
 import axios from 'axios';
 import './App.css';
+import { findChunksParams } from './searchQuery';
 
 // Set the public Mapbox access token
 mapboxgl.accessToken = import.meta.env.VITE_MAPBOX_PUBLIC_KEY;
@@ -124,6 +125,8 @@ function App() {
   const [isLoading, setIsLoading] = useState(false);
   const [message, setMessage] = useState("");
   const [validChunks, setValidChunks] = useState([]);
+  // Parameters of the search that produced validChunks, sent with rolls
+  const [lastSearch, setLastSearch] = useState(null);
   const [chosenChunk, setChosenChunk] = useState(null);
   const [observations, setObservations] = useState([]);
   const [showInfo, setShowInfo] = useState(false);
@@ -454,16 +457,20 @@ Center: ${((min_lat + max_lat) / 2).toFixed(6)}, ${((min_lon + max_lon) / 2).toF
         ? selectedCategories.join(',') 
         : null;
 
-      const findChunksResponse = await axios.post(`${API_BASE_URL}/api/find-chunks`, {
-        lat,
-        lon,
-        drivetime: parsedDrivetime,
-        chunkSize: parsedChunkSize,
-        taxaFilter: currentTaxaFilter
+      // GET with the canonical query so the browser (and any proxy) can cache repeat searches
+      const findChunksResponse = await axios.get(`${API_BASE_URL}/api/find-chunks`, {
+        params: findChunksParams({
+          lat,
+          lon,
+          drivetime: parsedDrivetime,
+          chunkSize: parsedChunkSize,
+          taxa: selectedCategories
+        })
       });
 
       const chunks = findChunksResponse.data.chunks;
       setValidChunks(chunks);
+      setLastSearch({ lat, lon, drivetime: parsedDrivetime, chunkSize: parsedChunkSize });
 
       if (chunks.length === 0) {
         setMessage("No valid chunks found. Try increasing the drivetime or changing filters.");
@@ -697,8 +704,18 @@ Center: ${((min_lat + max_lat) / 2).toFixed(6)}, ${((min_lon + max_lon) / 2).toF
     setMessage("Rolling for a chunk...");
 
     try {
-      // Randomly select one chunk
-      const randomChunkBounds = validChunks[Math.floor(Math.random() * validChunks.length)];
+      // The server regenerates the search's chunks, probes several random ones
+      // at once and returns the first with observations, along with those
+      // observations
+      const rollResponse = await axios.post(`${API_BASE_URL}/api/roll`, {
+        ...lastSearch,
+        taxaFilter: selectedCategories.length > 0 ? selectedCategories.join(',') : null
+      });
+      const { chunk: randomChunkBounds, observations: rolledObservations } = rollResponse.data;
+      if (!randomChunkBounds) {
+        setMessage("No chunks to roll from. Try a new search!");
+        return;
+      }
       setChosenChunk(randomChunkBounds);
       
       // Store the selected chunk bounds for export functionality
@@ -723,29 +740,18 @@ Center: ${((min_lat + max_lat) / 2).toFixed(6)}, ${((min_lon + max_lon) / 2).toF
       addLayer('chosen-chunk', chunkGeoJSON);
       map.current.fitBounds([[min_lon, min_lat], [max_lon, max_lat]], { padding: 40 });
 
-      // Fetch observations for the chosen chunk
-      setMessage("Fetching iNaturalist observations...");
-      const obsResponse = await axios.get(`${API_BASE_URL}/api/observations`, {
-          params: {
-              swlng: min_lon,
-              swlat: min_lat,
-              nelng: max_lon,
-              nelat: max_lat,
-              taxaFilter: selectedCategories.length > 0 ? selectedCategories.join(',') : null
-          }
-      });
-      setObservations(obsResponse.data.observations);
+      setObservations(rolledObservations);
       
       // Add observation markers to the map
-      addObservationMarkers(obsResponse.data.observations);
+      addObservationMarkers(rolledObservations);
       
       // Highlight the selected chunk
       highlightSelectedChunk(randomChunkBounds);
       
-      if (obsResponse.data.observations.length === 0) {
+      if (rolledObservations.length === 0) {
         setMessage(`No observations found in this chunk. Try rolling again or selecting different categories!`);
       } else {
-        setMessage(`Found ${obsResponse.data.observations.length} observations in your chosen chunk!`);
+        setMessage(`Found ${rolledObservations.length} observations in your chosen chunk!`);
       }
 
     } catch (error) {
@@ -0,0 +1,34 @@
+// Decoder for the compact chunk grid returned by /api/find-chunks with
+// format: 'compact'. Produces the same [min_lon, min_lat, max_lon, max_lat]
+// arrays as the default JSON response.
+
+// Cell (col, row) of the global lattice starts at -180 + col * stepLon and
+// -90 + row * stepLat, computed the same way the server does so the decoded
+// bounds match the JSON response exactly
+const cellStarts = (base, firstCell, step, count) => {
+  const starts = new Array(count + 1);
+  for (let i = 0; i <= count; i++) {
+    starts[i] = base + (firstCell + i) * step;
+  }
+  return starts;
+};
+
+export const decodeCompactGrid = (grid) => {
+  const [cols, rows] = grid.dims;
+  const [stepLon, stepLat] = grid.lattice.step;
+  const [originCol, originRow] = grid.originCell;
+  const lonStarts = cellStarts(-180, originCol, stepLon, cols);
+  const latStarts = cellStarts(-90, originRow, stepLat, rows);
+  const mask = Uint8Array.from(atob(grid.mask), (c) => c.charCodeAt(0));
+
+  const chunks = [];
+  for (let row = 0; row < rows; row++) {
+    for (let col = 0; col < cols; col++) {
+      const bit = row * cols + col;
+      if ((mask[bit >> 3] >> (bit & 7)) & 1) {
+        chunks.push([lonStarts[col], latStarts[row], lonStarts[col + 1], latStarts[row + 1]]);
+      }
+    }
+  }
+  return chunks;
+};
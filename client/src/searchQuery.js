@@ -0,0 +1,26 @@
+// Query parameters for GET /api/find-chunks in the server's canonical form,
+// so a repeated search requests the same URL and hits the browser and proxy
+// caches.
+
+// Must match the server's ISOCHRONE_CACHE_PRECISION
+const COORDINATE_PRECISION = 3;
+
+// Formatted like Python's repr of a float, e.g. 1 -> "1.0"
+const formatFloat = (value) => (Number.isInteger(value) ? value.toFixed(1) : String(value));
+
+const roundCoordinate = (value) => formatFloat(Number(value.toFixed(COORDINATE_PRECISION)));
+
+export const findChunksParams = ({ lat, lon, drivetime, chunkSize, taxa }) => {
+  // Key order is the canonical parameter order
+  const params = {
+    lat: roundCoordinate(lat),
+    lon: roundCoordinate(lon),
+    drivetime,
+    chunkSize: formatFloat(chunkSize),
+  };
+  const taxaFilter = [...new Set(taxa)].sort().join(',');
+  if (taxaFilter) {
+    params.taxaFilter = taxaFilter;
+  }
+  return params;
+};
@@ -43,7 +43,7 @@ echo "🔧 Setting up Python backend..."
 cd server
 python3.11 -m venv venv
 source venv/bin/activate
-pip install fastapi uvicorn aiohttp shapely pyproj python-dotenv
+pip install fastapi uvicorn aiohttp shapely pyproj python-dotenv numpy orjson
 
 # Set up Node.js frontend
 echo "⚛️ Setting up React frontend..."
@@ -1,64 +1,363 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Literal
+from urllib.parse import urlencode
 import aiohttp
 import asyncio
+import logging
+import orjson
 
-from app.services import geo_service, inaturalist_service
+from app.api import http_cache
+from app.services import cache, geo_service, inaturalist_service, prefetch, roll_service, upstream, vector_tiles
+from app.services.http_client import get_session
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-class FindChunksRequest(BaseModel):
+# orjson for every response. Routes with large payloads return an
+# ORJSONResponse themselves, which also skips FastAPI's jsonable_encoder walk.
+router = APIRouter(default_response_class=ORJSONResponse)
+
+class ChunkSearchOptions(BaseModel):
+    chunkSize: float
+    taxaFilter: str | None = None
+    includeCounts: bool = False
+    includeParkland: bool = False
+    # "ndjson" streams one chunk per line as grid rows are generated;
+    # "compact" returns the grid as its lattice, origin cell, dims and a bitset mask;
+    # "tiles" holds the grid server-side and returns a vector tile URL for it
+    format: Literal["json", "ndjson", "compact", "tiles"] = "json"
+
+class FindChunksRequest(ChunkSearchOptions):
     lat: float
     lon: float
     drivetime: int
-    chunkSize: float
+    # Drivetime of the search the client already holds: only the chunks that
+    # changed since then are returned
+    previousDrivetime: int | None = None
+
+class SearchOrigin(BaseModel):
+    lat: float
+    lon: float
+    drivetime: int
+
+class BatchFindChunksRequest(ChunkSearchOptions):
+    origins: list[SearchOrigin]
+    # "intersection": chunks reachable from every origin; "union": from any
+    combine: Literal["intersection", "union"] = "intersection"
+
+BATCH_MAX_ORIGINS = 10
+TILES_PATH = "/api/tiles"
+
+class RollRequest(BaseModel):
+    # Either the chunk set to roll from, or the find-chunks search that produced it
+    chunks: list[tuple[float, float, float, float]] | None = None
+    lat: float | None = None
+    lon: float | None = None
+    drivetime: int | None = None
+    chunkSize: float | None = None
     taxaFilter: str | None = None
 
 @router.post("/find-chunks")
-async def find_chunks(request: FindChunksRequest):
-    async with aiohttp.ClientSession() as session:
-        try:
-            print(f"Received request: lat={request.lat}, lon={request.lon}, drivetime={request.drivetime}, chunkSize={request.chunkSize}, taxaFilter={request.taxaFilter}")
-            
-            # Validate required fields
-            if request.lat is None or request.lon is None:
-                raise HTTPException(status_code=400, detail="Latitude and longitude are required")
-            if request.drivetime is None or request.drivetime <= 0:
-                raise HTTPException(status_code=400, detail="Valid drivetime is required")
-            if request.drivetime > 60:
-                raise HTTPException(status_code=400, detail="Drivetime cannot exceed 60 minutes (Mapbox API limitation)")
-            if request.chunkSize is None or request.chunkSize <= 0:
-                raise HTTPException(status_code=400, detail="Valid chunk size is required")
-            
-            # 1. Get drivetime polygon
-            print("Calling get_drivetime_isochrone...")
-            isochrone = await geo_service.get_drivetime_isochrone(session, request.lat, request.lon, request.drivetime)
+async def find_chunks(request: FindChunksRequest, session: aiohttp.ClientSession = Depends(get_session)):
+    try:
+        logger.info("find-chunks lat=%s lon=%s drivetime=%s chunkSize=%s taxaFilter=%s format=%s",
+                    request.lat, request.lon, request.drivetime, request.chunkSize, request.taxaFilter, request.format)
 
-            # 2. Generate potential chunks within the polygon
-            potential_chunks = geo_service.generate_chunks_in_isochrone(isochrone, request.chunkSize)
-            
-            # 3. Return all chunks - NO pre-filtering to avoid rate limiting
-            print(f"Generated {len(potential_chunks)} chunks within {request.drivetime} minute drivetime")
-            if request.taxaFilter:
-                print(f"Taxa filter '{request.taxaFilter}' will be applied when chunks are clicked/rolled, not during discovery")
-            
-            return {"chunks": potential_chunks}
-
-        except aiohttp.ClientResponseError as e:
-            print(f"ClientResponseError: status={e.status}, message={e.message}")
-            if "throttling" in str(e.message).lower():
-                raise HTTPException(status_code=429, detail="API rate limit exceeded. Please wait a moment and try again with a smaller area or shorter drivetime.")
-            else:
-                raise HTTPException(status_code=e.status, detail=f"An external API error occurred: {e.message}")
-        except ValueError as e:
-            print(f"ValueError in find_chunks: {str(e)}")
-            if "No features found" in str(e):
-                raise HTTPException(status_code=400, detail=f"Unable to calculate drivetime area for {request.drivetime} minutes. Try a shorter drivetime (Mapbox limit is typically 60 minutes).")
+        # Validate required fields
+        if request.lat is None or request.lon is None:
+            raise HTTPException(status_code=400, detail="Latitude and longitude are required")
+        if request.drivetime is None or request.drivetime <= 0:
+            raise HTTPException(status_code=400, detail="Valid drivetime is required")
+        if request.drivetime > 60:
+            raise HTTPException(status_code=400, detail="Drivetime cannot exceed 60 minutes (Mapbox API limitation)")
+        _validate_search_options(request)
+        if request.previousDrivetime is not None:
+            if request.previousDrivetime <= 0 or request.previousDrivetime > 60:
+                raise HTTPException(status_code=400, detail="previousDrivetime must be between 1 and 60 minutes")
+            if request.format != "json":
+                raise HTTPException(status_code=400, detail="previousDrivetime is only supported with the json format")
+
+        # Searches from the same origin share a lattice, so their chunks line up
+        lattice = geo_service.lattice_for(request.chunkSize, request.lat)
+
+        # 1. Get drivetime polygon (the previous one is cached from that search)
+        if request.previousDrivetime is not None:
+            isochrone, previous = await asyncio.gather(
+                geo_service.get_drivetime_isochrone(session, request.lat, request.lon, request.drivetime),
+                geo_service.get_drivetime_isochrone(session, request.lat, request.lon, request.previousDrivetime),
+            )
+            return await _delta_response(session, isochrone, previous, request, lattice)
+        isochrone = await geo_service.get_drivetime_isochrone(session, request.lat, request.lon, request.drivetime)
+
+        return await _chunks_response(session, isochrone, request, lattice)
+
+    except HTTPException:
+        raise
+    except aiohttp.ClientResponseError as e:
+        logger.warning("ClientResponseError: status=%s, message=%s", e.status, e.message)
+        if e.status == 429 or "throttling" in str(e.message).lower():
+            raise HTTPException(status_code=429, detail="API rate limit exceeded. Please wait a moment and try again with a smaller area or shorter drivetime.")
+        else:
+            raise HTTPException(status_code=e.status, detail=f"An external API error occurred: {e.message}")
+    except ValueError as e:
+        logger.warning("ValueError in find_chunks: %s", e)
+        if "No features found" in str(e):
+            raise HTTPException(status_code=400, detail=f"Unable to calculate drivetime area for {request.drivetime} minutes. Try a shorter drivetime (Mapbox limit is typically 60 minutes).")
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}")
+    except Exception as e:
+        logger.exception("Unexpected error in find_chunks: %s: %s", type(e).__name__, e)
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/find-chunks")
+async def find_chunks_get(
+    http_request: Request,
+    lat: float,
+    lon: float,
+    drivetime: int,
+    chunkSize: float,
+    taxaFilter: str | None = Query(None),
+    includeCounts: bool = False,
+    includeParkland: bool = False,
+    output_format: Literal["json", "ndjson", "compact", "tiles"] = Query("json", alias="format"),
+    previousDrivetime: int | None = None,
+    session: aiohttp.ClientSession = Depends(get_session)
+):
+    """find-chunks as a cacheable GET.
+
+    Equivalent query strings are answered directly, with a Link header naming
+    the canonical URL (the one the client builds) so browsers and proxies can
+    keep a single copy per search. Responses carry an ETag and Cache-Control,
+    and a matching If-None-Match gets a 304.
+    """
+    request = FindChunksRequest(
+        lat=lat, lon=lon, drivetime=drivetime, chunkSize=chunkSize, taxaFilter=taxaFilter,
+        includeCounts=includeCounts, includeParkland=includeParkland, format=output_format,
+        previousDrivetime=previousDrivetime,
+    )
+    # Counts come from live observations, so they go stale like observation pages
+    max_age = http_cache.OBSERVATIONS_CACHE_MAX_AGE if includeCounts else http_cache.FIND_CHUNKS_CACHE_MAX_AGE
+
+    response = http_cache.conditional_response(http_request, await find_chunks(request, session), max_age)
+    canonical_query = _canonical_find_chunks_query(request)
+    if http_request.url.query != canonical_query:
+        response.headers["Link"] = f'<{http_request.url.path}?{canonical_query}>; rel="canonical"'
+    return response
+
+def _canonical_find_chunks_query(request: FindChunksRequest) -> str:
+    """The single query string for a find-chunks search.
+
+    The origin is rounded like the isochrone cache key (closer origins share
+    an isochrone anyway), taxa are de-duplicated and sorted, parameters are in
+    a fixed order and defaults are left out.
+    """
+    precision = geo_service.ISOCHRONE_CACHE_PRECISION
+    params = [
+        ("lat", round(request.lat, precision)),
+        ("lon", round(request.lon, precision)),
+        ("drivetime", request.drivetime),
+        ("chunkSize", float(request.chunkSize)),
+    ]
+    if request.previousDrivetime is not None:
+        params.append(("previousDrivetime", request.previousDrivetime))
+    taxa = sorted({cat.strip() for cat in (request.taxaFilter or "").split(',') if cat.strip()})
+    if taxa:
+        params.append(("taxaFilter", ",".join(taxa)))
+    if request.includeCounts:
+        params.append(("includeCounts", "true"))
+    if request.includeParkland:
+        params.append(("includeParkland", "true"))
+    if request.format != "json":
+        params.append(("format", request.format))
+    return urlencode(params, safe=",")
+
+@router.post("/find-chunks/batch")
+async def find_chunks_batch(request: BatchFindChunksRequest, session: aiohttp.ClientSession = Depends(get_session)):
+    """find-chunks for several origins at once, over the intersection or union of their isochrones."""
+    if not request.origins:
+        raise HTTPException(status_code=400, detail="At least one origin is required")
+    if len(request.origins) > BATCH_MAX_ORIGINS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ORIGINS} origins are supported")
+    for origin in request.origins:
+        if origin.drivetime <= 0 or origin.drivetime > 60:
+            raise HTTPException(status_code=400, detail="Each drivetime must be between 1 and 60 minutes")
+    _validate_search_options(request)
+
+    try:
+        logger.info("find-chunks batch origins=%d combine=%s chunkSize=%s format=%s",
+                    len(request.origins), request.combine, request.chunkSize, request.format)
+        isochrones = await asyncio.gather(*(
+            geo_service.get_drivetime_isochrone(session, origin.lat, origin.lon, origin.drivetime)
+            for origin in request.origins
+        ))
+        area = geo_service.combine_isochrones(isochrones, request.combine)
+        if area.is_empty:
+            # No area reachable from every origin
+            if request.format == "ndjson":
+                return StreamingResponse(iter(()), media_type="application/x-ndjson")
+            if request.format == "compact":
+                response = {"grid": None}
+            elif request.format == "tiles":
+                response = {"searchId": None, "tileUrl": None, "chunkCount": 0}
             else:
-                raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}")
-        except Exception as e:
-            print(f"Unexpected error in find_chunks: {type(e).__name__}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+                response = {"chunks": [], "ids": []}
+            if request.includeCounts:
+                response.update(counts=[], countsComplete=True)
+            if request.includeParkland:
+                response["parkland"] = []
+            return ORJSONResponse(response)
+
+        lattice = geo_service.lattice_for(request.chunkSize, sum(origin.lat for origin in request.origins) / len(request.origins))
+        return await _chunks_response(session, area, request, lattice)
+
+    except HTTPException:
+        raise
+    except aiohttp.ClientResponseError as e:
+        logger.warning("ClientResponseError in find_chunks_batch: status=%s, message=%s", e.status, e.message)
+        if e.status == 429 or "throttling" in str(e.message).lower():
+            raise HTTPException(status_code=429, detail="API rate limit exceeded. Please wait a moment and try again with fewer origins or shorter drivetimes.")
+        raise HTTPException(status_code=e.status, detail=f"An external API error occurred: {e.message}")
+    except ValueError as e:
+        logger.warning("ValueError in find_chunks_batch: %s", e)
+        raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}")
+    except Exception as e:
+        logger.exception("Unexpected error in find_chunks_batch: %s: %s", type(e).__name__, e)
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+def _validate_search_options(request: ChunkSearchOptions):
+    if request.chunkSize is None or request.chunkSize <= 0:
+        raise HTTPException(status_code=400, detail="Valid chunk size is required")
+    if request.format == "ndjson" and (request.includeCounts or request.includeParkland):
+        raise HTTPException(status_code=400, detail="includeCounts and includeParkland are not supported with the ndjson format")
+    if request.format == "tiles" and request.includeParkland:
+        raise HTTPException(status_code=400, detail="includeParkland is not supported with the tiles format")
+
+async def _chunks_response(session: aiohttp.ClientSession, isochrone, request: ChunkSearchOptions,
+                          lattice: geo_service.ChunkLattice):
+    """Grids the search area on the lattice and builds the find-chunks response in the requested format."""
+    # 2. Generate potential chunks within the polygon
+    geo_service.check_grid_size(isochrone, request.chunkSize, lattice)
+    if request.format == "ndjson":
+        return StreamingResponse(_ndjson_chunk_rows(isochrone, request.chunkSize, lattice), media_type="application/x-ndjson")
+    if request.format == "compact" and not (request.includeCounts or request.includeParkland):
+        return ORJSONResponse({"grid": geo_service.encode_compact_grid(isochrone, request.chunkSize, lattice)})
+    potential_chunks = await geo_service.generate_chunks_in_isochrone_async(isochrone, request.chunkSize, lattice)
+    chunk_ids = lattice.chunk_ids(potential_chunks)
+
+    logger.info("Generated %d chunks", len(potential_chunks))
+    if request.format == "compact":
+        response = {"grid": geo_service.encode_compact_grid(isochrone, request.chunkSize, lattice)}
+    elif request.format == "tiles":
+        response = {"lattice": lattice.describe(), "chunkCount": len(potential_chunks), "bounds": list(isochrone.bounds)}
+    else:
+        response = {"chunks": potential_chunks, "ids": chunk_ids, "lattice": lattice.describe()}
+
+    await _score_chunks(session, response, isochrone.bounds, potential_chunks, chunk_ids, lattice, request)
+
+    if request.format == "tiles":
+        # Counts travel in the tiles rather than in the response
+        search_id = vector_tiles.store_grid(lattice, chunk_ids, response.pop("counts", None))
+        response["searchId"] = search_id
+        response["tileUrl"] = f"{TILES_PATH}/{search_id}/{{z}}/{{x}}/{{y}}.mvt"
+    return ORJSONResponse(response)
+
+async def _delta_response(session: aiohttp.ClientSession, isochrone, previous, request: FindChunksRequest,
+                          lattice: geo_service.ChunkLattice):
+    """find-chunks response with only the chunks that changed since the previousDrivetime search."""
+    geo_service.check_grid_size(isochrone, request.chunkSize, lattice)
+    geo_service.check_grid_size(previous, request.chunkSize, lattice)
+    added_chunks, removed_ids = await geo_service.generate_chunk_delta_async(isochrone, previous, request.chunkSize, lattice)
+    chunk_ids = lattice.chunk_ids(added_chunks)
+
+    logger.info("Generated %d new chunks, %d dropped since drivetime %d",
+                len(added_chunks), len(removed_ids), request.previousDrivetime)
+    response = {
+        "chunks": added_chunks,
+        "ids": chunk_ids,
+        "removedIds": removed_ids,
+        "lattice": lattice.describe(),
+        "previousDrivetime": request.previousDrivetime,
+    }
+
+    # Counts are only needed for the added chunks, so only their extent is pulled
+    added_bounds = None
+    if added_chunks:
+        min_lons, min_lats, max_lons, max_lats = zip(*added_chunks)
+        added_bounds = (min(min_lons), min(min_lats), max(max_lons), max(max_lats))
+    await _score_chunks(session, response, added_bounds, added_chunks, chunk_ids, lattice, request)
+    return ORJSONResponse(response)
+
+async def _score_chunks(session: aiohttp.ClientSession, response: dict, bounds: tuple | None, chunks: list,
+                        chunk_ids: list[int], lattice: geo_service.ChunkLattice, request: ChunkSearchOptions):
+    """Adds the optional per-chunk counts and parkland estimates to response.
+
+    Counts come from one bulk pull over bounds, which must cover the chunks.
+    """
+    # 3. Optionally score every chunk from one bulk pull over the search area
+    if request.includeCounts and not chunks:
+        response["counts"] = []
+        response["countsComplete"] = True
+    elif request.includeCounts:
+        taxa_ids = None
+        if request.taxaFilter:
+            category_names = [cat.strip() for cat in request.taxaFilter.split(',') if cat.strip()]
+            taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
+        lons, lats, complete = await inaturalist_service.get_observation_coordinates(session, bounds, taxa_ids)
+        counts = geo_service.count_points_in_chunks(lattice, chunk_ids, lons, lats)
+        inaturalist_service.prime_presence_cache(chunks, counts, taxa_ids, complete)
+        response["counts"] = counts
+        response["countsComplete"] = complete
+    elif request.taxaFilter:
+        # Otherwise NO pre-filtering to avoid rate limiting
+        logger.debug("Taxa filter '%s' will be applied when chunks are clicked/rolled, not during discovery", request.taxaFilter)
+
+    # 4. Optionally estimate parkland cover for every chunk from the park index
+    if request.includeParkland:
+        response["parkland"] = geo_service.classify_chunks(chunks)["parkland_percentage"] if chunks else []
+
+def _ndjson_chunk_rows(isochrone, chunk_size_km: float, lattice: geo_service.ChunkLattice):
+    """Yields NDJSON lines (one chunk per line), a grid row at a time."""
+    for row in geo_service.iter_chunk_rows(isochrone, chunk_size_km, lattice):
+        yield b"".join(orjson.dumps(chunk) + b"\n" for chunk in row)
+
+@router.get("/tiles/{search_id}/{z}/{x}/{y}.mvt")
+async def get_tile(http_request: Request, search_id: str, z: int, x: int, y: int):
+    """One Mapbox Vector Tile of a search's chunk grid.
+
+    The "chunks" layer has a square polygon per chunk in the tile, with the
+    chunk ID as feature ID and a "count" property if the search asked for
+    counts. Grids come from find-chunks with format "tiles".
+    """
+    if not vector_tiles.valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+    grid = await vector_tiles.get_grid(search_id)
+    if grid is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired searchId; run the search again")
+
+    if grid["ids"].size < geo_service.GRID_OFFLOAD_MIN_CELLS:
+        body = vector_tiles.encode_tile(grid, z, x, y)
+    else:
+        body = await asyncio.to_thread(vector_tiles.encode_tile, grid, z, x, y)
+    # A search ID always names the same grid, so tiles can be cached like the search
+    return http_cache.conditional_response(
+        http_request, Response(body, media_type=vector_tiles.MEDIA_TYPE), http_cache.FIND_CHUNKS_CACHE_MAX_AGE
+    )
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters for the server-side caches."""
+    return cache.get_all_stats()
+
+@router.get("/upstream-stats")
+async def get_upstream_stats():
+    """Rate limiter queue depth, wait time, retry and coalescing metrics per upstream host."""
+    return upstream.get_upstream_stats()
+
+@router.get("/prefetch-stats")
+async def get_prefetch_stats():
+    """Neighbour/roll-candidate prefetch counts and hit rate."""
+    return prefetch.get_prefetch_stats()
 
 async def filter_chunk(session, chunk, taxa_ids):
     """Helper function to run taxa filter for a single chunk."""
@@ -66,56 +365,115 @@ async def filter_chunk(session, chunk, taxa_ids):
     if taxa_ids:
         has_observations = await inaturalist_service.check_observations_in_chunk(session, chunk, taxa_ids)
         return chunk, has_observations
-    
+
     # If no filters, chunk passes
     return chunk, True
 
+def _validate_cursor(cursor):
+    """Rejects malformed continuation tokens with a 400."""
+    if cursor is None:
+        return
+    try:
+        inaturalist_service.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/observations")
 async def get_observations(
+    http_request: Request,
     nelat: float, nelng: float, swlat: float, swlng: float,
-    taxaFilter: str | None = Query(None)
+    taxaFilter: str | None = Query(None),
+    cursor: str | None = Query(None),
+    session: aiohttp.ClientSession = Depends(get_session)
 ):
+    """First page of a chunk's observations, or the pages after a nextCursor."""
     chunk_bounds = (swlng, swlat, nelng, nelat)
-    async with aiohttp.ClientSession() as session:
-        try:
-            taxa_ids = None
-            if taxaFilter:
-                # Split comma-separated categories
-                category_names = [cat.strip() for cat in taxaFilter.split(',') if cat.strip()]
-                taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
-            
-            observations = await inaturalist_service.get_observations_in_chunk(session, chunk_bounds, taxa_ids)
-            return {"observations": observations}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+    _validate_cursor(cursor)
+    try:
+        taxa_ids = None
+        if taxaFilter:
+            # Split comma-separated categories
+            category_names = [cat.strip() for cat in taxaFilter.split(',') if cat.strip()]
+            taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
+
+        if cursor is None:
+            prefetch.record_request(chunk_bounds, taxa_ids)
+        page = await inaturalist_service.get_observations_page(session, chunk_bounds, taxa_ids, cursor)
+        if cursor is None:
+            prefetch.schedule_neighbours(chunk_bounds, taxa_ids)
+        return http_cache.conditional_response(http_request, ORJSONResponse(page), http_cache.OBSERVATIONS_CACHE_MAX_AGE)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/chunk-observations")
-async def get_chunk_observations(request: dict):
-    """Get observations for a specific chunk bounds."""
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Extract chunk bounds and taxa filter from request
-            chunk_bounds_list = request.get("chunkBounds")
-            if not chunk_bounds_list:
-                raise HTTPException(status_code=400, detail="Missing chunkBounds in request")
-            
-            chunk_bounds = tuple(chunk_bounds_list)  # (min_lon, min_lat, max_lon, max_lat)
-            taxa_filter = request.get("taxaFilter")
-            
-            # Parse taxa filter
-            taxa_ids = None
-            if taxa_filter:
-                category_names = [cat.strip() for cat in taxa_filter.split(',') if cat.strip()]
-                taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
-                if not taxa_ids:
-                    raise HTTPException(status_code=404, detail=f"No valid taxa found for filter: '{taxa_filter}'")
-            
-            observations = await inaturalist_service.get_observations_in_chunk(
-                session, 
-                chunk_bounds, 
-                taxa_ids
-            )
-            return {"observations": observations}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+async def get_chunk_observations(request: dict, session: aiohttp.ClientSession = Depends(get_session)):
+    """Get observations for a specific chunk bounds, paged with an optional cursor."""
+    cursor = request.get("cursor")
+    _validate_cursor(cursor)
+    try:
+        # Extract chunk bounds and taxa filter from request
+        chunk_bounds_list = request.get("chunkBounds")
+        if not chunk_bounds_list:
+            raise HTTPException(status_code=400, detail="Missing chunkBounds in request")
+
+        chunk_bounds = tuple(chunk_bounds_list)  # (min_lon, min_lat, max_lon, max_lat)
+        taxa_filter = request.get("taxaFilter")
+
+        # Parse taxa filter
+        taxa_ids = None
+        if taxa_filter:
+            category_names = [cat.strip() for cat in taxa_filter.split(',') if cat.strip()]
+            taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
+            if not taxa_ids:
+                raise HTTPException(status_code=404, detail=f"No valid taxa found for filter: '{taxa_filter}'")
+
+        if cursor is None:
+            prefetch.record_request(chunk_bounds, taxa_ids)
+        page = await inaturalist_service.get_observations_page(
+            session,
+            chunk_bounds,
+            taxa_ids,
+            cursor
+        )
+        if cursor is None:
+            # The next click is usually an adjacent chunk
+            prefetch.schedule_neighbours(chunk_bounds, taxa_ids)
+        return ORJSONResponse(page)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/roll")
+async def roll(request: RollRequest, session: aiohttp.ClientSession = Depends(get_session)):
+    """Picks a random chunk with observations, probing several candidates at once."""
+    search = (request.lat, request.lon, request.drivetime, request.chunkSize)
+    if request.chunks is None and None in search:
+        raise HTTPException(status_code=400, detail="Provide either chunks or lat, lon, drivetime and chunkSize")
+    try:
+        chunks = request.chunks
+        if chunks is None:
+            # Regenerating the grid is cheap: the isochrone is cached from the search
+            isochrone = await geo_service.get_drivetime_isochrone(session, request.lat, request.lon, request.drivetime)
+            lattice = geo_service.lattice_for(request.chunkSize, request.lat)
+            geo_service.check_grid_size(isochrone, request.chunkSize, lattice)
+            chunks = await geo_service.generate_chunks_in_isochrone_async(isochrone, request.chunkSize, lattice)
+
+        taxa_ids = None
+        if request.taxaFilter:
+            category_names = [cat.strip() for cat in request.taxaFilter.split(',') if cat.strip()]
+            taxa_ids = await inaturalist_service.get_taxa_ids(session, category_names)
+
+        if not chunks:
+            result = {"chunk": None, "observations": [], "nextCursor": None, "found": False, "probes": 0}
+        else:
+            result = await roll_service.roll_chunk(session, chunks, taxa_ids)
+            prefetch.schedule_roll_candidates(chunks, taxa_ids)
+        return ORJSONResponse(result)
+    except aiohttp.ClientResponseError as e:
+        logger.warning("ClientResponseError in roll: status=%s, message=%s", e.status, e.message)
+        if e.status == 429:
+            raise HTTPException(status_code=429, detail="API rate limit exceeded. Please wait a moment and try again.")
+        raise HTTPException(status_code=e.status, detail=f"An external API error occurred: {e.message}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,42 @@
+import hashlib
+import os
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# Browser / reverse proxy cache lifetimes for the cacheable GET endpoints. Grids
+# are a pure function of the search; observation pages change as new
+# observations arrive. 0 still sends validators but makes clients revalidate.
+FIND_CHUNKS_CACHE_MAX_AGE = int(os.getenv("FIND_CHUNKS_CACHE_MAX_AGE", "3600"))
+OBSERVATIONS_CACHE_MAX_AGE = int(os.getenv("OBSERVATIONS_CACHE_MAX_AGE", "300"))
+
+def cache_control(max_age: int) -> str:
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag from a hash of the response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def conditional_response(request: Request, response: Response, max_age: int) -> Response:
+    """Adds ETag and Cache-Control to a successful response, or answers 304 if the client's copy is current.
+
+    Streaming responses aren't buffered to be hashed, so they only get Cache-Control.
+    """
+    if isinstance(response, StreamingResponse):
+        response.headers["Cache-Control"] = cache_control(max_age)
+        return response
+
+    etag = etag_for(response.body)
+    headers = {"ETag": etag, "Cache-Control": cache_control(max_age)}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
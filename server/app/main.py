@@ -1,8 +1,31 @@
-from fastapi import FastAPI
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .api.endpoints import router
+from .services import cache, http_client, metrics, persistent_cache, prefetch
 
-app = FastAPI(title="Adventure Chunk API")
+# Structured key=value log lines, filterable by logger and level
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="ts=%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)r",
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream session for the whole process
+    await http_client.startup()
+    cache.start_sweeper()
+    yield
+    prefetch.shutdown()
+    await cache.stop_sweeper()
+    persistent_cache.close()
+    await http_client.shutdown()
+
+app = FastAPI(title="Adventure Chunk API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -13,6 +36,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode the series
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        )
+
 # Include API routes
 app.include_router(router, prefix="/api")
 
@@ -20,6 +61,10 @@ app.include_router(router, prefix="/api")
 def read_root():
     return {"message": "Adventure Chunk API is running!"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
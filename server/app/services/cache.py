@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import orjson
+
+from app.services import metrics, persistent_cache
+
+logger = logging.getLogger(__name__)
+
+# How often the background sweeper purges expired entries from every cache
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+
+_caches = []  # every TTLCache, for sweeping and stats
+_sweeper_task: asyncio.Task | None = None
+
+def estimate_size(value) -> int:
+    """Approximate deep memory footprint in bytes of plain JSON-like data."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+_MISSING = object()
+
+def _backend_key(key) -> str:
+    return key if isinstance(key, str) else orjson.dumps(key).decode()
+
+class TTLCache:
+    """In-memory cache with per-entry TTL and size-bounded LRU eviction.
+
+    If max_bytes is set, entries are also evicted least recently used first to
+    keep their estimated total footprint within that memory budget.
+
+    If persistent is set and a shared tier is configured (see
+    persistent_cache), aget reads through to it on a miss and every set is
+    queued to be written behind to it, under the cache's name as namespace,
+    so the event loop never waits on it. Values go through encode/decode on
+    the way, orjson by default.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, max_bytes: int | None = None,
+                 persistent: bool = False, encode: Callable = orjson.dumps, decode: Callable = orjson.loads):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+        self.encode = encode
+        self.decode = decode
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        _caches.append(self)
+
+    def _backend(self):
+        return persistent_cache.get_backend() if self.persistent else None
+
+    def get(self, key, default=None):
+        """Returns the cached value for key, or default if it is missing or expired.
+
+        Memory only; use aget to also read through to the shared tier.
+        """
+        with metrics.span("cache_lookup"):
+            value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        return value
+
+    async def aget(self, key, default=None):
+        """Like get, but on a memory miss looks the key up in the shared tier from a worker thread.
+
+        A hit there is cached in memory for its remaining TTL.
+        """
+        with metrics.span("cache_lookup"):
+            value = self._lookup(key)
+        backend = self._backend()
+        if value is _MISSING and backend is not None:
+            row = await asyncio.to_thread(self._read_backend, backend, key)
+            # Something may have set the key while the read was in flight
+            value = self._lookup(key)
+            if value is _MISSING and row is not None:
+                value = row[0]
+                self._store(key, value, row[1] - time.time())
+                self.hits += 1
+                self.backend_hits += 1
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        return value
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expirations += 1
+        return _MISSING
+
+    def _read_backend(self, backend, key) -> tuple | None:
+        """(decoded value, expires_at) from the shared tier, or None. Runs in a worker thread."""
+        try:
+            row = backend.get(self.name, _backend_key(key))
+            return None if row is None else (self.decode(row[0]), row[1])
+        except Exception as e:
+            logger.warning("Shared cache read failed for '%s': %s", self.name, e)
+            return None
+
+    def peek(self, key, default=None):
+        """Like get, but memory only and without touching recency or the hit/miss counters."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key, value, ttl_seconds: float | None = None):
+        """Stores value under key, evicting least recently used entries past the limits."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._store(key, value, ttl)
+        self._write_through([(key, value)], ttl)
+
+    def set_many(self, items: list[tuple], ttl_seconds: float | None = None):
+        """set for many (key, value) pairs, written to the shared tier in one batch."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        for key, value in items:
+            self._store(key, value, ttl)
+        self._write_through(items, ttl)
+
+    def _write_through(self, items: list[tuple], ttl: float):
+        backend = self._backend()
+        if backend is None or not items:
+            return
+        try:
+            encoded = [(_backend_key(key), self.encode(value)) for key, value in items]
+        except Exception as e:
+            logger.warning("Shared cache write failed for '%s': %s", self.name, e)
+            return
+        persistent_cache.write_behind(backend, self.name, encoded, time.time() + ttl)
+
+    def _store(self, key, value, ttl: float):
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        if key in self._entries:
+            self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Larger than the whole budget; caching it would only flush everything else
+            return
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.current_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.current_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def sweep(self) -> int:
+        """Removes all expired entries and returns how many were dropped."""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def __contains__(self, key) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters for this cache."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "persistent": self._backend() is not None,
+            "backend_hits": self.backend_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+def get_all_stats() -> dict:
+    """Stats for every cache, keyed by cache name."""
+    return {cache.name: cache.stats() for cache in _caches}
+
+async def _sweep_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for cache in _caches:
+            expired = cache.sweep()
+            if expired:
+                logger.debug("Cache sweep: dropped %d expired entries from '%s'", expired, cache.name)
+        backend = persistent_cache.get_backend()
+        if backend is not None:
+            try:
+                expired = await asyncio.to_thread(backend.sweep)
+                if expired:
+                    logger.debug("Cache sweep: dropped %d expired entries from the shared tier", expired)
+            except Exception as e:
+                logger.warning("Shared cache sweep failed: %s", e)
+
+def start_sweeper(interval: float = CACHE_SWEEP_INTERVAL):
+    """Starts the background expiry sweeper on the running event loop."""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_forever(interval))
+
+async def stop_sweeper():
+    """Cancels the background expiry sweeper."""
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+    _sweeper_task = None
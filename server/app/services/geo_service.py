@@ -1,40 +1,114 @@
 import os
+import asyncio
+import logging
+import base64
 import aiohttp
 import random
-from shapely.geometry import Polygon, Point, box
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, box
 from pyproj import Geod, Transformer
 import math
+import functools
+
+from app.services import landcover, metrics, park_index, upstream
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Constants
 MAPBOX_API_KEY = os.getenv("MAPBOX_API_KEY") or "pk.eyJ1IjoicmV1YmsiLCJhIjoiY21maXo4ODVvMHJseDJrb2Iydmx4MjZicyJ9.YO8spbPilarCPTmJOQ1aOA"
 MAPTILER_API_KEY = os.getenv("MAPTILER_API_KEY") or "oVxnt4avzfPgc6bP14YU"
+# Overridable so benchmarks can point at a local stand-in server
+MAPBOX_API_URL = os.getenv("MAPBOX_API_URL", "https://api.mapbox.com").rstrip("/")
 GEOD = Geod(ellps="WGS84")
+_rng = np.random.default_rng()
+# Grids with at least this many cells are generated off the event loop
+GRID_OFFLOAD_MIN_CELLS = int(os.getenv("GRID_OFFLOAD_MIN_CELLS", "20000"))
+# Searches whose grid would cover more cells than this are refused: the grid
+# arrays are built whole and grow with area / chunkSize²
+GRID_MAX_CELLS = int(os.getenv("GRID_MAX_CELLS", "2000000"))
+
+# Chunks are cells of a global lattice per chunk size, so the same square has
+# the same bounds and ID in every search and per-chunk caches are shared.
+# Longitude steps shrink with latitude, so each band of this many degrees of
+# |latitude| has its own lattice, picked from the search origin.
+LATTICE_BAND_DEGREES = float(os.getenv("LATTICE_BAND_DEGREES", "2"))
+LATTICE_TOLERANCE_DEGREES = 1e-9
+KM_PER_DEGREE_LAT = 111.0
+
+# Isochrone cache: origin rounded to this many decimal places (3 ≈ 100 m)
+ISOCHRONE_CACHE_PRECISION = int(os.getenv("ISOCHRONE_CACHE_PRECISION", "3"))
+ISOCHRONE_CACHE_TTL = float(os.getenv("ISOCHRONE_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+ISOCHRONE_CACHE_MAX_ENTRIES = int(os.getenv("ISOCHRONE_CACHE_MAX_ENTRIES", "256"))
+_isochrone_cache = TTLCache(
+    "isochrone", ISOCHRONE_CACHE_MAX_ENTRIES, ISOCHRONE_CACHE_TTL,
+    persistent=True, encode=shapely.to_wkb, decode=shapely.from_wkb,
+)
+
+def _isochrone_cache_key(lat: float, lon: float, minutes: int, profile: str) -> tuple:
+    """Cache key with the origin quantized so nearby searches share a polygon."""
+    return (
+        round(lat, ISOCHRONE_CACHE_PRECISION),
+        round(lon, ISOCHRONE_CACHE_PRECISION),
+        int(minutes),
+        profile,
+    )
+
+async def get_drivetime_isochrone(session: aiohttp.ClientSession, lat: float, lon: float, minutes: int, profile: str = "driving") -> Polygon:
+    """Fetches a drivetime polygon (isochrone) from the Mapbox API, with caching."""
+    cache_key = _isochrone_cache_key(lat, lon, minutes, profile)
+    cached = await _isochrone_cache.aget(cache_key)
+    if cached is not None:
+        logger.debug("Isochrone cache HIT for %s", cache_key)
+        return cached
 
-async def get_drivetime_isochrone(session: aiohttp.ClientSession, lat: float, lon: float, minutes: int) -> Polygon:
-    """Fetches a drivetime polygon (isochrone) from the Mapbox API."""
-    print(f"get_drivetime_isochrone called with: lat={lat}, lon={lon}, minutes={minutes}")
-    print(f"MAPBOX_API_KEY is: {MAPBOX_API_KEY is not None}")
+    # Query with the quantized origin so the cached polygon matches its key
+    lat, lon = cache_key[0], cache_key[1]
+    logger.info("Fetching isochrone lat=%s lon=%s minutes=%s profile=%s", lat, lon, minutes, profile)
     
-    url = f"https://api.mapbox.com/isochrone/v1/mapbox/driving/{lon},{lat}"
+    url = f"{MAPBOX_API_URL}/isochrone/v1/mapbox/{profile}/{lon},{lat}"
     params = {
         "contours_minutes": str(int(minutes)),
         "polygons": "true",
         "access_token": MAPBOX_API_KEY
     }
-    async with session.get(url, params=params, ssl=False) as response:
-        response.raise_for_status()
-        data = await response.json()
-        print(f"Mapbox API response: {data}")
-        # The API returns coordinates in (lon, lat) format, which Shapely expects
-        if not data or 'features' not in data or not data['features']:
-            raise ValueError("No features found in Mapbox API response")
-        return Polygon(data['features'][0]['geometry']['coordinates'][0])
+    with metrics.span("isochrone_fetch"):
+        data = await upstream.get_json(session, url, params)
+    logger.debug("Mapbox isochrone response with %d features", len(data.get("features", [])) if data else 0)
+    # The API returns coordinates in (lon, lat) format, which Shapely expects
+    if not data or 'features' not in data or not data['features']:
+        raise ValueError("No features found in Mapbox API response")
+    isochrone = Polygon(data['features'][0]['geometry']['coordinates'][0])
+
+    _isochrone_cache.set(cache_key, isochrone)
+    return isochrone
+
+def combine_isochrones(isochrones: list[Polygon], mode: str = "intersection"):
+    """Intersection (reachable from every origin) or union (from any) of several isochrones.
+
+    Returns a Polygon or MultiPolygon, which the grid functions accept like a
+    single isochrone; it is empty when an intersection has no common area.
+    """
+    if mode == "intersection":
+        combined = shapely.intersection_all(isochrones)
+    else:
+        combined = shapely.union_all(isochrones)
+    # Drop the lines and points left where boundaries merely touch
+    polygons = [part for part in shapely.get_parts(combined) if part.geom_type == "Polygon"]
+    return shapely.union_all(polygons) if polygons else Polygon()
 
 async def check_parkland_percentage(session: aiohttp.ClientSession, chunk_bounds: tuple) -> float:
     """
-    Fast parkland percentage check using optimized heuristic method.
-    For production, this would use cached land cover data or faster APIs.
+    Parkland percentage from the local land-cover raster when one is configured,
+    otherwise the fast heuristic method.
     """
+    tileset = landcover.get_tileset()
+    if tileset is not None:
+        percentage = tileset.green_percentage([chunk_bounds])[0]
+        if not np.isnan(percentage):
+            return float(percentage)
+
     # Skip slow Overpass API calls and use optimized heuristic
     return await check_parkland_percentage_fast(session, chunk_bounds)
 
@@ -55,128 +129,52 @@ async def check_parkland_percentage_fast(session: aiohttp.ClientSession, chunk_b
 
 def is_in_major_park(lon: float, lat: float) -> bool:
     """Check if point is within a major park boundary."""
-    major_parks = [
-        # Melbourne major parks (expanded and corrected)
-        {"center": (144.9700, -37.8300), "radius": 0.020},  # Royal Botanic Gardens (expanded)
-        {"center": (144.9800, -37.8500), "radius": 0.025},  # Albert Park (expanded)
-        {"center": (144.9600, -37.7800), "radius": 0.035},  # Royal Park (much larger radius)
-        {"center": (144.9500, -37.7900), "radius": 0.015},  # Carlton Gardens (expanded)
-        {"center": (144.9600, -37.8200), "radius": 0.012},  # Fitzroy Gardens (expanded)
-        {"center": (144.9800, -37.8000), "radius": 0.020},  # Princes Park (Carlton)
-        {"center": (144.9900, -37.8400), "radius": 0.018},  # St Kilda Botanical Gardens
-        {"center": (144.9400, -37.8100), "radius": 0.015},  # Edinburgh Gardens (Fitzroy)
-        {"center": (144.9700, -37.8000), "radius": 0.012},  # University of Melbourne Park
-        {"center": (144.9900, -37.8200), "radius": 0.015},  # St Kilda Foreshore
-        {"center": (144.9300, -37.8400), "radius": 0.020},  # Yarra Bend Park
-        {"center": (144.9800, -37.7600), "radius": 0.025},  # Darebin Parklands
-        {"center": (144.9400, -37.8700), "radius": 0.018},  # Brighton Beach area
-        {"center": (144.9200, -37.8000), "radius": 0.015},  # Coburg Lake Reserve
-        {"center": (145.0000, -37.7900), "radius": 0.020},  # Bundoora Park
-        
-        # Sydney major parks (expanded)
-        {"center": (151.2200, -33.8700), "radius": 0.015},  # Hyde Park (expanded)
-        {"center": (151.2400, -33.8900), "radius": 0.035},  # Centennial Park (expanded)
-        {"center": (151.2100, -33.8800), "radius": 0.020},  # Royal Botanic Gardens Sydney
-        {"center": (151.2500, -33.8600), "radius": 0.018},  # Bondi Beach area
-        {"center": (151.2000, -33.9000), "radius": 0.025},  # Olympic Park area
-        
-        # New York major parks (expanded)
-        {"center": (-73.9654, 40.7829), "radius": 0.030},   # Central Park (expanded)
-        {"center": (-74.0445, 40.6892), "radius": 0.020},   # Battery Park area (expanded)
-        
-        # London major parks (expanded)
-        {"center": (-0.1500, 51.5100), "radius": 0.020},    # Hyde Park (expanded)
-        {"center": (-0.1600, 51.5000), "radius": 0.015},    # Green Park
-        {"center": (-0.1400, 51.5200), "radius": 0.015},    # Regent's Park
-    ]
-    
-    for park in major_parks:
-        distance = ((lon - park["center"][0])**2 + (lat - park["center"][1])**2)**0.5
-        if distance <= park["radius"]:
-            return True
-    
-    return False
+    return bool(park_index.get_index("major_park").contains(lon, lat)[0])
+
+def _chunk_sample_points(chunks, samples_per_side: int) -> tuple:
+    """Evenly spaced sample points (edges included) in each chunk, as (N, samples) lon and lat arrays."""
+    bounds = np.asarray(chunks, dtype=float).reshape(-1, 4)
+    min_lon, min_lat, max_lon, max_lat = (bounds[:, k:k + 1] for k in range(4))
+    fractions = np.arange(samples_per_side) / (samples_per_side - 1)
+    # Same ordering as the nested i (lon), j (lat) sampling loops
+    lon_fractions = np.repeat(fractions, samples_per_side)
+    lat_fractions = np.tile(fractions, samples_per_side)
+    lons = min_lon + (max_lon - min_lon) * lon_fractions
+    lats = min_lat + (max_lat - min_lat) * lat_fractions
+    return lons, lats
+
+def chunks_overlap_major_park(chunks) -> np.ndarray:
+    """Vectorized chunk_overlaps_major_park over many chunks at once."""
+    lons, lats = _chunk_sample_points(chunks, 3)
+    inside = park_index.get_index("major_park").contains(lons.ravel(), lats.ravel())
+    return inside.reshape(lons.shape).any(axis=1)
 
 def chunk_overlaps_major_park(chunk_bounds: tuple) -> bool:
     """Check if chunk overlaps with any major park."""
-    min_lon, min_lat, max_lon, max_lat = chunk_bounds
-    
-    # Sample points within the chunk
-    sample_points = []
-    for i in range(3):
-        for j in range(3):
-            lon = min_lon + (max_lon - min_lon) * (i / 2)
-            lat = min_lat + (max_lat - min_lat) * (j / 2)
-            sample_points.append((lon, lat))
-    
-    # Check if any sample points are in major parks
-    for lon, lat in sample_points:
-        if is_in_major_park(lon, lat):
-            return True
-    
-    return False
+    return bool(chunks_overlap_major_park([chunk_bounds])[0])
 
 def is_likely_green_space(lon: float, lat: float) -> bool:
     """Check if area is likely to contain green spaces (expanded coverage)."""
-    # Allow areas near known parks or in specific green corridors
-    green_areas = [
-        # Melbourne green corridors (expanded coverage)
-        {"center": (144.9700, -37.8200), "radius": 0.025},  # South Yarra area (expanded)
-        {"center": (144.9800, -37.8600), "radius": 0.020},  # Albert Park area (expanded)
-        {"center": (144.9500, -37.8000), "radius": 0.018},  # Carlton area (expanded)
-        {"center": (144.9600, -37.7900), "radius": 0.020},  # North Melbourne area
-        {"center": (144.9800, -37.8100), "radius": 0.015},  # Carlton North area
-        {"center": (144.9400, -37.8200), "radius": 0.018},  # Fitzroy area
-        {"center": (144.9900, -37.8300), "radius": 0.020},  # St Kilda area
-        {"center": (144.9300, -37.8300), "radius": 0.015},  # Richmond area
-        {"center": (144.9500, -37.8400), "radius": 0.015},  # South Melbourne area
-        {"center": (144.9700, -37.8600), "radius": 0.018},  # Port Melbourne area
-        
-        # Sydney green areas (expanded)
-        {"center": (151.2300, -33.8800), "radius": 0.020},  # Eastern suburbs (expanded)
-        {"center": (151.2000, -33.8700), "radius": 0.015},  # Inner west
-        {"center": (151.2500, -33.8800), "radius": 0.018},  # Eastern suburbs
-        
-        # New York green areas (expanded)
-        {"center": (-73.9600, 40.7900), "radius": 0.025},   # Upper East Side (expanded)
-        {"center": (-73.9700, 40.7800), "radius": 0.020},   # Upper West Side
-        
-        # London green areas (expanded)
-        {"center": (-0.1400, 51.5100), "radius": 0.018},    # Central London parks (expanded)
-        {"center": (-0.1300, 51.5200), "radius": 0.015},    # Regent's Park area
-    ]
-    
-    for area in green_areas:
-        distance = ((lon - area["center"][0])**2 + (lat - area["center"][1])**2)**0.5
-        if distance <= area["radius"]:
-            return True
-    
-    return False
+    return bool(park_index.get_index("green_space").contains(lon, lat)[0])
+
+def _likely_parkland(lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """Vectorized is_likely_parkland."""
+    # Within ~3km of a known park or green space
+    near_park = park_index.get_index("parkland").contains(lons, lats, inclusive=False)
+
+    # Otherwise a random guess: Melbourne is more generous (40%) than elsewhere (15%)
+    in_melbourne = (lats > -38.0) & (lats < -37.7) & (lons > 144.8) & (lons < 145.1)
+    threshold = np.where(in_melbourne, 0.6, 0.85)
+    return near_park | (_rng.random(lons.shape) > threshold)
 
 async def check_parkland_percentage_heuristic(session: aiohttp.ClientSession, chunk_bounds: tuple) -> float:
     """
     Fallback heuristic method for parkland percentage when API calls fail.
     """
-    min_lon, min_lat, max_lon, max_lat = chunk_bounds
-    
-    # Sample points within the chunk
-    sample_points = []
-    num_samples = 16  # 4x4 grid
-    
-    for i in range(4):
-        for j in range(4):
-            lon = min_lon + (max_lon - min_lon) * (i / 3)
-            lat = min_lat + (max_lat - min_lat) * (j / 3)
-            sample_points.append((lon, lat))
-    
-    park_count = 0
-    
-    for lon, lat in sample_points:
-        if is_likely_parkland(lon, lat):
-            park_count += 1
-    
-    park_percentage = (park_count / num_samples) * 100
-    print(f"Heuristic parkland percentage for chunk {chunk_bounds}: {park_percentage:.2f}%")
+    # Sample points within the chunk (4x4 grid)
+    lons, lats = _chunk_sample_points([chunk_bounds], 4)
+    park_percentage = float(_likely_parkland(lons.ravel(), lats.ravel()).mean() * 100)
+    logger.debug("Heuristic parkland percentage for chunk %s: %.2f%%", chunk_bounds, park_percentage)
     
     return park_percentage
 
@@ -185,93 +183,329 @@ def is_likely_parkland(lon: float, lat: float) -> bool:
     Heuristic function to determine if a location is likely parkland.
     Uses known park coordinates and geographic patterns.
     """
-    # Known major parks and green spaces (coordinates in lon, lat)
-    known_parks = [
-        # Melbourne area parks (expanded list)
-        (144.9631, -37.8136),  # Melbourne CBD area
-        (144.9700, -37.8300),  # Royal Botanic Gardens
-        (144.9800, -37.8500),  # Albert Park
-        (144.9900, -37.8700),  # St Kilda area
-        (144.9500, -37.7900),  # Carlton Gardens
-        (144.9600, -37.8200),  # Fitzroy Gardens
-        (144.9400, -37.8000),  # Princes Park
-        (144.9800, -37.8200),  # Fawkner Park
-        (144.9700, -37.8400),  # Albert Park Lake
-        (144.9600, -37.7800),  # Royal Park
-        
-        # Sydney area parks
-        (151.2093, -33.8688),  # Sydney CBD
-        (151.2200, -33.8700),  # Hyde Park
-        (151.2400, -33.8900),  # Centennial Park area
-        
-        # New York area parks
-        (-73.9654, 40.7829),   # Central Park
-        (-74.0445, 40.6892),   # Battery Park area
-        
-        # London area parks
-        (-0.1276, 51.5074),    # London CBD
-        (-0.1500, 51.5100),    # Hyde Park
-        (-0.1400, 51.5000),    # Green Park area
-    ]
-    
-    # Check proximity to known parks (within ~3km)
-    for park_lon, park_lat in known_parks:
-        distance = ((lon - park_lon)**2 + (lat - park_lat)**2)**0.5
-        if distance < 0.03:  # Approximately 3km threshold
-            return True
-    
-    # For Melbourne area specifically, be more generous with parkland detection
-    if (lat > -38.0 and lat < -37.7 and lon > 144.8 and lon < 145.1):
-        # Melbourne area - higher chance of parkland
-        import random
-        return random.random() > 0.6  # 40% chance of being parkland
-    
-    # For other areas, be more conservative
-    import random
-    return random.random() > 0.85  # 15% chance of being parkland
+    return bool(_likely_parkland(np.array([lon], dtype=float), np.array([lat], dtype=float))[0])
 
-def generate_chunks_in_isochrone(isochrone: Polygon, chunk_size_km: float):
-    """Generates a complete grid of square chunks within the isochrone polygon."""
-    import math
-    
-    valid_chunks = []
-    # Get the bounding box of the isochrone
-    min_lon, min_lat, max_lon, max_lat = isochrone.bounds
-
-    # Use a global approach that works anywhere in the world
-    # Calculate chunk size in degrees (approximate)
-    # 1 degree of latitude ≈ 111 km, so 1 km ≈ 1/111 degrees
-    chunk_size_lat_deg = chunk_size_km / 111.0
-    
-    # For longitude, we need to account for the fact that longitude degrees 
-    # get smaller as we move away from the equator
-    # At latitude φ, 1 degree of longitude = 111 * cos(φ) km
-    center_lat = (min_lat + max_lat) / 2
-    lat_rad = math.radians(center_lat)
-    chunk_size_lon_deg = chunk_size_km / (111.0 * math.cos(lat_rad))
-    
-    # Generate a complete grid of chunks covering the entire isochrone area
-    current_lat = min_lat
-    while current_lat < max_lat:
-        current_lon = min_lon
-        while current_lon < max_lon:
-            # Create chunk bounds
-            chunk_min_lat = current_lat
-            chunk_max_lat = current_lat + chunk_size_lat_deg
-            chunk_min_lon = current_lon
-            chunk_max_lon = current_lon + chunk_size_lon_deg
-            
-            # Check if the center of the chunk is within the isochrone
-            center_lat = current_lat + chunk_size_lat_deg / 2
-            center_lon = current_lon + chunk_size_lon_deg / 2
-            
-            if isochrone.contains(Point(center_lon, center_lat)):
-                valid_chunks.append((chunk_min_lon, chunk_min_lat, chunk_max_lon, chunk_max_lat))
-            
-            current_lon += chunk_size_lon_deg
-        current_lat += chunk_size_lat_deg
-                
-    return valid_chunks
+def classify_chunks(chunks) -> dict:
+    """Classifies every chunk of a grid against the park index in one vectorized pass.
+
+    Returns arrays aligned with chunks: whether the center is in a major park
+    or green space, whether the chunk overlaps a major park, and the
+    check_parkland_percentage estimate (land-cover raster where it has
+    coverage, otherwise the fast heuristic).
+    """
+    bounds = np.asarray(chunks, dtype=float).reshape(-1, 4)
+    center_lons = (bounds[:, 0] + bounds[:, 2]) / 2
+    center_lats = (bounds[:, 1] + bounds[:, 3]) / 2
+    in_major_park = park_index.get_index("major_park").contains(center_lons, center_lats)
+    parkland_percentage = np.where(in_major_park, 85.0, 10.0)
+    tileset = landcover.get_tileset()
+    if tileset is not None:
+        raster_percentage = tileset.green_percentage(bounds)
+        parkland_percentage = np.where(np.isnan(raster_percentage), parkland_percentage, raster_percentage)
+    return {
+        "in_major_park": in_major_park,
+        "overlaps_major_park": chunks_overlap_major_park(bounds),
+        "likely_green_space": park_index.get_index("green_space").contains(center_lons, center_lats),
+        "parkland_percentage": parkland_percentage,
+    }
+
+class ChunkLattice:
+    """The global chunk grid for one chunk size and latitude band.
+
+    Cell (col, row) spans longitudes -180 + col * step_lon to -180 + (col + 1) * step_lon
+    and latitudes -90 + row * step_lat to -90 + (row + 1) * step_lat. Its ID,
+    row * cols + col, is the same in every search on this lattice.
+    """
+
+    def __init__(self, chunk_size_km: float, band: int):
+        self.chunk_size_km = chunk_size_km
+        self.band = band
+        # 1 degree of latitude ≈ 111 km; longitude degrees shrink with cos(latitude),
+        # taken at the middle of the band
+        band_lat = min((band + 0.5) * LATTICE_BAND_DEGREES, 89.0)
+        self.step_lat = chunk_size_km / KM_PER_DEGREE_LAT
+        self.step_lon = chunk_size_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(band_lat)))
+        self.cols = math.ceil(360 / self.step_lon)
+
+    def describe(self) -> dict:
+        """What a client needs to map chunk IDs to cells and back."""
+        return {"chunkSize": self.chunk_size_km, "band": self.band, "cols": self.cols, "step": [self.step_lon, self.step_lat]}
+
+    def axes(self, bounds: tuple) -> tuple:
+        """Column and row indices of the cells covering bounds."""
+        min_lon, min_lat, max_lon, max_lat = bounds
+        cols = np.arange(math.floor((min_lon + 180) / self.step_lon), math.floor((max_lon + 180) / self.step_lon) + 1)
+        rows = np.arange(math.floor((min_lat + 90) / self.step_lat), math.floor((max_lat + 90) / self.step_lat) + 1)
+        return cols, rows
+
+    def min_lons(self, cols):
+        return -180 + cols * self.step_lon
+
+    def min_lats(self, rows):
+        return -90 + rows * self.step_lat
+
+    def cell_bounds(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """(n, 4) bounds of the cells at matching cols and rows."""
+        return np.column_stack((self.min_lons(cols), self.min_lats(rows), self.min_lons(cols + 1), self.min_lats(rows + 1)))
+
+    def ids(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(rows, dtype=np.int64) * self.cols + cols
+
+    def chunk_ids(self, chunks) -> list[int]:
+        """IDs of chunks (bounds) taken from this lattice."""
+        bounds = np.asarray(chunks, dtype=float).reshape(-1, 4)
+        cols = np.rint((bounds[:, 0] + 180) / self.step_lon).astype(np.int64)
+        rows = np.rint((bounds[:, 1] + 90) / self.step_lat).astype(np.int64)
+        return self.ids(cols, rows).tolist()
+
+    def point_ids(self, lons, lats) -> np.ndarray:
+        """IDs of the cells containing each point."""
+        cols = np.floor((np.asarray(lons, dtype=float) + 180) / self.step_lon).astype(np.int64)
+        rows = np.floor((np.asarray(lats, dtype=float) + 90) / self.step_lat).astype(np.int64)
+        return self.ids(cols, rows)
+
+    def chunk_id(self, chunk_bounds: tuple) -> int | None:
+        """ID of the cell with these bounds, or None if they are not a cell of this lattice."""
+        col = round((chunk_bounds[0] + 180) / self.step_lon)
+        row = round((chunk_bounds[1] + 90) / self.step_lat)
+        expected = (self.min_lons(col), self.min_lats(row), self.min_lons(col + 1), self.min_lats(row + 1))
+        if any(abs(actual - cell) > LATTICE_TOLERANCE_DEGREES for actual, cell in zip(chunk_bounds, expected)):
+            return None
+        return row * self.cols + col
+
+# Edge neighbours first, then the diagonals
+_NEIGHBOUR_OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, -1), (-1, 1))
+
+@functools.lru_cache(maxsize=256)
+def get_lattice(chunk_size_km: float, band: int) -> ChunkLattice:
+    return ChunkLattice(chunk_size_km, band)
+
+def lattice_for(chunk_size_km: float, lat: float) -> ChunkLattice:
+    """The lattice searches from an origin at this latitude are gridded on."""
+    return get_lattice(round(float(chunk_size_km), 6), int(abs(lat) // LATTICE_BAND_DEGREES))
+
+def lattice_cell(chunk_bounds: tuple) -> tuple | None:
+    """(chunk size, band, ID) of a lattice chunk from its bounds, or None for off-lattice bounds."""
+    min_lon, min_lat, max_lon, max_lat = chunk_bounds
+    width, height = max_lon - min_lon, max_lat - min_lat
+    if not (width > 0 and height > 0):
+        return None
+    chunk_size_km = round(height * KM_PER_DEGREE_LAT, 6)
+    # The cell's aspect ratio gives cos() of its band's middle latitude
+    band_cos = chunk_size_km / (KM_PER_DEGREE_LAT * width)
+    if not 0 < band_cos <= 1:
+        return None
+    band = int(math.degrees(math.acos(band_cos)) // LATTICE_BAND_DEGREES)
+    chunk_id = get_lattice(chunk_size_km, band).chunk_id(chunk_bounds)
+    return None if chunk_id is None else (chunk_size_km, band, chunk_id)
+
+def neighbouring_chunks(chunk_bounds: tuple) -> list[tuple]:
+    """The 8 lattice chunks around a lattice chunk, edge neighbours first; [] for off-lattice bounds."""
+    cell = lattice_cell(chunk_bounds)
+    if cell is None:
+        return []
+    chunk_size_km, band, chunk_id = cell
+    lattice = get_lattice(chunk_size_km, band)
+    row, col = divmod(chunk_id, lattice.cols)
+    cols = np.array([col + d_col for d_col, _ in _NEIGHBOUR_OFFSETS])
+    rows = np.array([row + d_row for _, d_row in _NEIGHBOUR_OFFSETS])
+    return [tuple(chunk) for chunk in lattice.cell_bounds(cols, rows).tolist()]
+
+def _search_lattice(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None) -> ChunkLattice:
+    """The given lattice, or the one for the middle of the isochrone."""
+    if lattice is not None:
+        return lattice
+    _, min_lat, _, max_lat = isochrone.bounds
+    return lattice_for(chunk_size_km, (min_lat + max_lat) / 2 if not isochrone.is_empty else 0.0)
+
+def _grid_axes(isochrone: Polygon, lattice: ChunkLattice) -> tuple:
+    """Column and row indices of the lattice cells covering the isochrone's bounding box."""
+    if isochrone.is_empty:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return lattice.axes(isochrone.bounds)
+
+def estimate_grid_cells(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None) -> int:
+    """Number of grid cells covering the isochrone's bounding box."""
+    cols, rows = _grid_axes(isochrone, _search_lattice(isochrone, chunk_size_km, lattice))
+    return cols.size * rows.size
+
+def check_grid_size(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None):
+    """Raises ValueError if gridding the isochrone at this chunk size would exceed GRID_MAX_CELLS."""
+    cells = estimate_grid_cells(isochrone, chunk_size_km, lattice)
+    if cells > GRID_MAX_CELLS:
+        raise ValueError(
+            f"Search area is too large for a {chunk_size_km} km chunk size ({cells} grid cells, "
+            f"limit {GRID_MAX_CELLS}); use a larger chunk size or a shorter drivetime"
+        )
+
+def _inside_mask(isochrone: Polygon, lattice: ChunkLattice, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Boolean (row, col) mask of cells whose center is within the isochrone."""
+    # Row-major (lat outer, lon inner) to keep the original chunk ordering
+    lon_grid, lat_grid = np.meshgrid(lattice.min_lons(cols), lattice.min_lats(rows))
+    shapely.prepare(isochrone)
+    return shapely.contains_xy(
+        isochrone,
+        lon_grid + lattice.step_lon / 2,
+        lat_grid + lattice.step_lat / 2,
+    )
+
+def generate_chunks_in_isochrone(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None):
+    """Generates a complete grid of square chunks within the isochrone polygon.
+
+    Chunks are cells of the global lattice (by default the one for the middle
+    of the isochrone). All cell centers are built as NumPy arrays and tested in
+    a single vectorized call against the prepared isochrone, instead of one
+    Point per cell.
+    """
+    with metrics.span("grid_generation"):
+        lattice = _search_lattice(isochrone, chunk_size_km, lattice)
+        cols, rows = _grid_axes(isochrone, lattice)
+        if rows.size == 0 or cols.size == 0:
+            return []
+
+        # A chunk is kept if its center is within the isochrone
+        row_index, col_index = np.nonzero(_inside_mask(isochrone, lattice, cols, rows))
+        bounds = lattice.cell_bounds(cols[col_index], rows[row_index])
+        return [tuple(chunk) for chunk in bounds.tolist()]
+
+def generate_chunk_delta(isochrone: Polygon, previous: Polygon, chunk_size_km: float,
+                         lattice: ChunkLattice | None = None) -> tuple[list, list[int]]:
+    """Chunks the isochrone covers that previous did not, and IDs of previous chunks it no longer covers.
+
+    Both are gridded on the same lattice. The isochrone is tested over its
+    whole bounding box, but previous only at cells that could change the
+    answer: those inside the isochrone (for added chunks) and those in
+    previous's bounding box (for removed ones). Widening a search from 30 to
+    45 minutes tests previous on little more than the new search's chunks
+    and yields just the new ring.
+    """
+    with metrics.span("grid_generation"):
+        lattice = _search_lattice(isochrone, chunk_size_km, lattice)
+        area = isochrone if previous.is_empty else shapely.union(shapely.envelope(isochrone), shapely.envelope(previous))
+        cols, rows = _grid_axes(area, lattice)
+        if rows.size == 0 or cols.size == 0:
+            return [], []
+
+        now = _inside_mask(isochrone, lattice, cols, rows)
+        before = np.zeros_like(now)
+        if not previous.is_empty:
+            previous_cols, previous_rows = _grid_axes(previous, lattice)
+            candidates = now.copy()
+            candidates[
+                np.searchsorted(rows, previous_rows[0]):np.searchsorted(rows, previous_rows[-1]) + 1,
+                np.searchsorted(cols, previous_cols[0]):np.searchsorted(cols, previous_cols[-1]) + 1,
+            ] = True
+            row_index, col_index = np.nonzero(candidates)
+            shapely.prepare(previous)
+            before[row_index, col_index] = shapely.contains_xy(
+                previous,
+                lattice.min_lons(cols[col_index]) + lattice.step_lon / 2,
+                lattice.min_lats(rows[row_index]) + lattice.step_lat / 2,
+            )
+
+        row_index, col_index = np.nonzero(now & ~before)
+        added = lattice.cell_bounds(cols[col_index], rows[row_index])
+        removed_rows, removed_cols = np.nonzero(before & ~now)
+        removed_ids = lattice.ids(cols[removed_cols], rows[removed_rows])
+        return [tuple(chunk) for chunk in added.tolist()], removed_ids.tolist()
+
+def iter_chunk_rows(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None):
+    """Yields the chunks of generate_chunks_in_isochrone one grid row at a time.
+
+    Only one row of cells is held in memory, so callers can stream chunks out
+    as they are produced regardless of grid size.
+    """
+    lattice = _search_lattice(isochrone, chunk_size_km, lattice)
+    cols, rows = _grid_axes(isochrone, lattice)
+    if rows.size == 0 or cols.size == 0:
+        return
+
+    shapely.prepare(isochrone)
+    min_lons = lattice.min_lons(cols)
+    center_lons = min_lons + lattice.step_lon / 2
+    max_lons = lattice.min_lons(cols + 1)
+    for row in rows.tolist():
+        lat, max_lat = lattice.min_lats(row), lattice.min_lats(row + 1)
+        inside = shapely.contains_xy(isochrone, center_lons, lat + lattice.step_lat / 2)
+        if inside.any():
+            yield [
+                (min_lon, lat, max_lon, max_lat)
+                for min_lon, max_lon in zip(min_lons[inside].tolist(), max_lons[inside].tolist())
+            ]
+
+def encode_compact_grid(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None) -> dict:
+    """Encodes the chunk grid as its lattice, origin cell, dimensions and a base64 bitset.
+
+    Bit i of the mask (little-endian within each byte) is cell i of the grid
+    in row-major order, rows running south to north from originCell (col,
+    row). decode_compact_grid turns it back into the exact chunks of
+    generate_chunks_in_isochrone.
+    """
+    with metrics.span("grid_generation"):
+        lattice = _search_lattice(isochrone, chunk_size_km, lattice)
+        cols, rows = _grid_axes(isochrone, lattice)
+        if rows.size == 0 or cols.size == 0:
+            inside = np.zeros((rows.size, cols.size), dtype=bool)
+        else:
+            inside = _inside_mask(isochrone, lattice, cols, rows)
+        origin_cell = [int(cols[0]), int(rows[0])] if inside.size else [0, 0]
+        return {
+            "encoding": "bitset-base64",
+            "lattice": lattice.describe(),
+            "originCell": origin_cell,
+            "origin": [lattice.min_lons(origin_cell[0]), lattice.min_lats(origin_cell[1])],
+            "step": [lattice.step_lon, lattice.step_lat],
+            "dims": [int(cols.size), int(rows.size)],
+            "mask": base64.b64encode(np.packbits(inside.ravel(), bitorder="little").tobytes()).decode("ascii"),
+        }
+
+def decode_compact_grid(grid: dict) -> list[tuple]:
+    """Expands a compact grid from encode_compact_grid back into chunk bounds."""
+    cols, rows = grid["dims"]
+    lattice = get_lattice(grid["lattice"]["chunkSize"], grid["lattice"]["band"])
+    origin_col, origin_row = grid["originCell"]
+    mask = np.frombuffer(base64.b64decode(grid["mask"]), dtype=np.uint8)
+    inside = np.unpackbits(mask, count=cols * rows, bitorder="little").astype(bool).reshape(rows, cols)
+
+    row_index, col_index = np.nonzero(inside)
+    bounds = lattice.cell_bounds(origin_col + col_index, origin_row + row_index)
+    return [tuple(chunk) for chunk in bounds.tolist()]
+
+def count_points_in_chunks(lattice: ChunkLattice, chunk_ids, lons, lats) -> list[int]:
+    """Number of points falling in each of the given lattice chunks."""
+    chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+    point_ids, point_counts = np.unique(lattice.point_ids(lons, lats), return_counts=True)
+    if point_ids.size == 0:
+        return [0] * chunk_ids.size
+    position = np.minimum(np.searchsorted(point_ids, chunk_ids), point_ids.size - 1)
+    return np.where(point_ids[position] == chunk_ids, point_counts[position], 0).tolist()
+
+def count_points_per_chunk(isochrone: Polygon, chunk_size_km: float, lons, lats, lattice: ChunkLattice | None = None) -> list[int]:
+    """Bins points into the chunk grid and returns one count per chunk.
+
+    Counts are aligned with the output of generate_chunks_in_isochrone for the
+    same isochrone, chunk size and lattice.
+    """
+    lattice = _search_lattice(isochrone, chunk_size_km, lattice)
+    cols, rows = _grid_axes(isochrone, lattice)
+    if rows.size == 0 or cols.size == 0:
+        return []
+
+    row_index, col_index = np.nonzero(_inside_mask(isochrone, lattice, cols, rows))
+    return count_points_in_chunks(lattice, lattice.ids(cols[col_index], rows[row_index]), lons, lats)
+
+async def generate_chunks_in_isochrone_async(isochrone: Polygon, chunk_size_km: float, lattice: ChunkLattice | None = None):
+    """Runs grid generation in a worker thread when the grid is large enough to block the event loop."""
+    if estimate_grid_cells(isochrone, chunk_size_km, lattice) < GRID_OFFLOAD_MIN_CELLS:
+        return generate_chunks_in_isochrone(isochrone, chunk_size_km, lattice)
+    return await asyncio.to_thread(generate_chunks_in_isochrone, isochrone, chunk_size_km, lattice)
+
+async def generate_chunk_delta_async(isochrone: Polygon, previous: Polygon, chunk_size_km: float,
+                                     lattice: ChunkLattice | None = None) -> tuple[list, list[int]]:
+    """generate_chunk_delta, off the event loop for large grids."""
+    if estimate_grid_cells(isochrone, chunk_size_km, lattice) < GRID_OFFLOAD_MIN_CELLS:
+        return generate_chunk_delta(isochrone, previous, chunk_size_km, lattice)
+    return await asyncio.to_thread(generate_chunk_delta, isochrone, previous, chunk_size_km, lattice)
 
 
 def is_likely_parkland_area(lon: float, lat: float) -> bool:
@@ -0,0 +1,58 @@
+import os
+import aiohttp
+
+# "pooled" shares one keep-alive session across requests; "per-request" opens a
+# fresh session per call (the old behaviour, kept for latency comparisons)
+HTTP_SESSION_MODE = os.getenv("HTTP_SESSION_MODE", "pooled")
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+
+_session: aiohttp.ClientSession | None = None
+
+def create_session() -> aiohttp.ClientSession:
+    """Creates a session with a keep-alive, DNS-cached connection pool."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TIMEOUT_SECONDS,
+        connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def startup():
+    """Opens the shared session. Called from the application lifespan."""
+    global _session
+    if HTTP_SESSION_MODE == "pooled" and (_session is None or _session.closed):
+        _session = create_session()
+
+async def shutdown():
+    """Closes the shared session and its pooled connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """Returns the shared session, creating it if the lifespan has not run."""
+    global _session
+    if _session is None or _session.closed:
+        _session = create_session()
+    return _session
+
+async def get_session():
+    """FastAPI dependency yielding the session services should use for upstream calls."""
+    if HTTP_SESSION_MODE == "per-request":
+        async with aiohttp.ClientSession() as session:
+            yield session
+    else:
+        yield get_shared_session()
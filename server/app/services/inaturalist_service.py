@@ -1,77 +1,149 @@
 import aiohttp
+import asyncio
+import base64
 import hashlib
 import json
-from datetime import datetime, timedelta
+import logging
+import os
+import numpy as np
+import orjson
 
-# Simple in-memory cache for chunk observations
-_chunk_cache = {}
-CACHE_DURATION = timedelta(hours=2)  # Cache for 2 hours
+from app.services import geo_service, metrics, observation_store, upstream
+from app.services.cache import TTLCache
 
-def _get_cache_key(chunk_bounds: tuple, taxa_ids: list[int] | None) -> str:
-    """Generate a cache key for chunk bounds and taxa filter."""
+logger = logging.getLogger(__name__)
+
+# Overridable so benchmarks can point at a local stand-in server
+INATURALIST_API_URL = os.getenv("INATURALIST_API_URL", "https://api.inaturalist.org/v1").rstrip("/")
+
+# Chunk presence checks and observation lists, bounded by entry count and memory
+CACHE_DURATION = float(os.getenv("OBSERVATION_CACHE_TTL_SECONDS", str(2 * 60 * 60)))  # Cache for 2 hours
+OBSERVATION_CACHE_MAX_ENTRIES = int(os.getenv("OBSERVATION_CACHE_MAX_ENTRIES", "5000"))
+OBSERVATION_CACHE_MAX_BYTES = int(os.getenv("OBSERVATION_CACHE_MAX_MB", "64")) * 1024 * 1024
+_chunk_cache = TTLCache("observations", OBSERVATION_CACHE_MAX_ENTRIES, CACHE_DURATION, OBSERVATION_CACHE_MAX_BYTES, persistent=True)
+
+# Iconic taxa IDs never change, so they are bundled rather than looked up
+_ICONIC_TAXA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "iconic_taxa.json")
+with open(_ICONIC_TAXA_PATH) as f:
+    ICONIC_TAXA = json.load(f)
+
+# Resolved free-text taxon names; misses are cached for a shorter time
+TAXA_CACHE_TTL = float(os.getenv("TAXA_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+TAXA_NEGATIVE_CACHE_TTL = float(os.getenv("TAXA_NEGATIVE_CACHE_TTL_SECONDS", str(60 * 60)))
+TAXA_CACHE_MAX_ENTRIES = int(os.getenv("TAXA_CACHE_MAX_ENTRIES", "1024"))
+_taxa_cache = TTLCache("taxa", TAXA_CACHE_MAX_ENTRIES, TAXA_CACHE_TTL, persistent=True)
+_MISSING = object()
+
+# Bulk scoring: the search bbox is split into BULK_SCORE_TILES x BULK_SCORE_TILES
+# tiles, each paged at most BULK_SCORE_MAX_PAGES times (200 observations a page)
+BULK_SCORE_TILES = int(os.getenv("BULK_SCORE_TILES", "2"))
+BULK_SCORE_MAX_PAGES = int(os.getenv("BULK_SCORE_MAX_PAGES", "3"))
+
+# Chunk observation lists: raw observations per page (200 is the API maximum),
+# and how many pages one continuation request fetches concurrently
+OBSERVATION_PAGE_SIZE = 200
+OBSERVATION_MAX_PAGES = int(os.getenv("OBSERVATION_MAX_PAGES", "5"))
+
+def _get_cache_key(chunk_bounds: tuple, taxa_ids: list[int] | None, kind: str = "presence") -> str:
+    """Generate a cache key for chunk bounds and taxa filter.
+
+    Lattice chunks are keyed by (chunk size, band, ID), so every search that
+    lands on the same cell shares its entries; other bounds are keyed as is.
+    """
+    cell = geo_service.lattice_cell(chunk_bounds)
     key_data = {
-        "bounds": chunk_bounds,
+        "kind": kind,
+        "chunk": cell if cell is not None else chunk_bounds,
         "taxa": sorted(taxa_ids) if taxa_ids else None
     }
-    return hashlib.md5(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+    return hashlib.md5(orjson.dumps(key_data, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)).hexdigest()
+
+async def _resolve_taxon_name(session: aiohttp.ClientSession, taxa_name: str) -> int | None:
+    """Looks up one taxon name on the iNaturalist API, caching hits and misses."""
+    url = f"{INATURALIST_API_URL}/taxa"
+    params = {"q": taxa_name, "is_active": "true"} # Search all ranks
+    data = await upstream.get_json(session, url, params)
+    logger.debug("iNaturalist taxa lookup for '%s' returned %d results", taxa_name, len(data.get("results", [])) if data else 0)
 
-def _is_cache_valid(timestamp: datetime) -> bool:
-    """Check if cache entry is still valid."""
-    return datetime.now() - timestamp < CACHE_DURATION
+    if data and 'results' in data and data['results']:
+        taxon_id = data['results'][0]['id']
+        _taxa_cache.set(taxa_name, taxon_id)
+    else:
+        taxon_id = None
+        _taxa_cache.set(taxa_name, None, TAXA_NEGATIVE_CACHE_TTL)
+    return taxon_id
 
 async def get_taxa_ids(session: aiohttp.ClientSession, taxa_names: list) -> list[int]:
-    """Gets taxon IDs for multiple scientific or common names."""
-    taxon_ids = []
-    
-    # Map common category names to their scientific names for better API results
-    category_mapping = {
-        "Aves": "Aves",
-        "Amphibia": "Amphibia", 
-        "Reptilia": "Reptilia",
-        "Mammalia": "Mammalia",
-        "Actinopterygii": "Actinopterygii",
-        "Mollusca": "Mollusca",
-        "Arachnida": "Arachnida",
-        "Insecta": "Insecta",
-        "Plantae": "Plantae",
-        "Fungi": "Fungi",
-        "Protozoa": "Protozoa",
-        "Unknown": "Unknown"
-    }
-    
-    for taxa_name in taxa_names:
-        url = "https://api.inaturalist.org/v1/taxa"
-        
-        # Use mapped name if available, otherwise use the original
-        search_term = category_mapping.get(taxa_name, taxa_name)
-        
-        params = {"q": search_term, "is_active": "true"} # Search all ranks
-        async with session.get(url, params=params, ssl=False) as response:
-            response.raise_for_status()
-            data = await response.json()
-            print(f"iNaturalist taxa API response for '{taxa_name}': {data}")
-            if data and 'results' in data and data['results']:
-                taxon_ids.append(data['results'][0]['id'])
-    
-    return taxon_ids
+    """Gets taxon IDs for multiple scientific or common names.
+
+    Iconic taxa come from the bundled table; other names are served from the
+    taxon cache or resolved concurrently against the iNaturalist API.
+    """
+    with metrics.span("taxa_resolution"):
+        resolved = {}
+        pending = []
+        for taxa_name in taxa_names:
+            if taxa_name in resolved or taxa_name in pending:
+                continue
+            if taxa_name in ICONIC_TAXA:
+                resolved[taxa_name] = ICONIC_TAXA[taxa_name]
+                continue
+            cached = await _taxa_cache.aget(taxa_name, _MISSING)
+            if cached is not _MISSING:
+                resolved[taxa_name] = cached
+            else:
+                pending.append(taxa_name)
+
+        if pending:
+            results = await asyncio.gather(*(_resolve_taxon_name(session, name) for name in pending))
+            resolved.update(zip(pending, results))
+
+        return [resolved[name] for name in taxa_names if resolved[name] is not None]
+
+def cached_presence(chunk_bounds: tuple, taxa_ids: list[int] | None) -> bool | None:
+    """What the caches already know about a chunk having observations, or None.
+
+    Peeks without affecting the cache stats, so it is cheap to call over a
+    whole chunk set.
+    """
+    result = _chunk_cache.peek(_get_cache_key(chunk_bounds, taxa_ids))
+    if result is not None:
+        return result
+    cached_page = _chunk_cache.peek(_get_cache_key(chunk_bounds, taxa_ids, "observations"))
+    if cached_page is not None:
+        return bool(cached_page["observations"])
+    return None
+
+def first_page_cached(chunk_bounds: tuple, taxa_ids: list[int] | None) -> bool:
+    """Whether the chunk's first observation page is in the in-memory cache."""
+    return _chunk_cache.peek(_get_cache_key(chunk_bounds, taxa_ids, "observations")) is not None
 
 async def check_observations_in_chunk(session: aiohttp.ClientSession, chunk_bounds: tuple, taxa_ids: list[int] | None) -> bool:
     """Checks if there's at least one verifiable observation in a chunk with caching."""
     # Check cache first
     cache_key = _get_cache_key(chunk_bounds, taxa_ids)
-    if cache_key in _chunk_cache:
-        cached_result, timestamp = _chunk_cache[cache_key]
-        if _is_cache_valid(timestamp):
-            print(f"Cache HIT for chunk {chunk_bounds[:2]}...")
-            return cached_result
-        else:
-            # Remove expired cache entry
-            del _chunk_cache[cache_key]
-    
-    print(f"Cache MISS - API call for chunk {chunk_bounds[:2]}...")
+    cached_result = await _chunk_cache.aget(cache_key)
+    if cached_result is not None:
+        logger.debug("Cache HIT for chunk %s", chunk_bounds[:2])
+        return cached_result
+
+    # A cached, non-empty observation list already answers the question
+    cached_page = await _chunk_cache.aget(_get_cache_key(chunk_bounds, taxa_ids, "observations"))
+    if cached_page and cached_page["observations"]:
+        return True
+
+    # Local observation store, if configured
+    if observation_store.enabled():
+        with metrics.span("observation_store_lookup"):
+            result = await observation_store.has_observations(chunk_bounds, taxa_ids)
+        if result or observation_store.OBSERVATION_STORE_FALLBACK != "live":
+            _chunk_cache.set(cache_key, result)
+            return result
+
+    logger.debug("Cache MISS - API call for chunk %s", chunk_bounds[:2])
     
     min_lon, min_lat, max_lon, max_lat = chunk_bounds
-    url = "https://api.inaturalist.org/v1/observations"
+    url = f"{INATURALIST_API_URL}/observations"
     params = {
         "nelat": max_lat,
         "nelng": max_lon,
@@ -83,21 +155,38 @@ async def check_observations_in_chunk(session: aiohttp.ClientSession, chunk_boun
     if taxa_ids and len(taxa_ids) > 0:
         params["taxon_id"] = ",".join(map(str, taxa_ids))
 
-    async with session.get(url, params=params, ssl=False) as response:
-        response.raise_for_status()
-        data = await response.json()
-        result = data.get('total_results', 0) > 0 if data else False
+    with metrics.span("observation_fetch"):
+        data = await upstream.get_json(session, url, params)
+    result = data.get('total_results', 0) > 0 if data else False
         
-        # Cache the result
-        _chunk_cache[cache_key] = (result, datetime.now())
-        print(f"Cached result for chunk {chunk_bounds[:2]}: {result}")
+    # Cache the result
+    _chunk_cache.set(cache_key, result)
+    logger.debug("Cached result for chunk %s: %s", chunk_bounds[:2], result)
         
-        return result
+    return result
 
-async def get_observations_in_chunk(session: aiohttp.ClientSession, chunk_bounds: tuple, taxa_ids: list[int] | None):
-    """Gets all verifiable observations for a given chunk."""
-    min_lon, min_lat, max_lon, max_lat = chunk_bounds
-    url = "https://api.inaturalist.org/v1/observations"
+async def _get_tile_observation_coordinates(session: aiohttp.ClientSession, tile_bounds: tuple, taxa_ids: list[int] | None, max_pages: int) -> tuple:
+    """Pages through one tile's observations by descending ID. Returns ({id: (lon, lat)}, complete).
+
+    Cached like observation pages, so repeating a search (or revalidating it)
+    within the cache lifetime doesn't pull the tile again.
+    """
+    cache_key = _get_cache_key(tile_bounds, taxa_ids, f"coordinates:{max_pages}")
+    cached = await _chunk_cache.aget(cache_key)
+    if cached is not None:
+        return {obs_id: (lon, lat) for obs_id, lon, lat in cached["coordinates"]}, cached["complete"]
+
+    coordinates, complete = await _fetch_tile_observation_coordinates(session, tile_bounds, taxa_ids, max_pages)
+    _chunk_cache.set(cache_key, {
+        "coordinates": [[obs_id, lon, lat] for obs_id, (lon, lat) in coordinates.items()],
+        "complete": complete,
+    })
+    return coordinates, complete
+
+async def _fetch_tile_observation_coordinates(session: aiohttp.ClientSession, tile_bounds: tuple, taxa_ids: list[int] | None,
+                                              max_pages: int) -> tuple:
+    min_lon, min_lat, max_lon, max_lat = tile_bounds
+    url = f"{INATURALIST_API_URL}/observations"
     params = {
         "nelat": max_lat,
         "nelng": max_lon,
@@ -106,53 +195,217 @@ async def get_observations_in_chunk(session: aiohttp.ClientSession, chunk_bounds
         "verifiable": "true",
         "per_page": 200, # Max allowed per page
         "order": "desc",
-        "order_by": "observed_on",
-        "photos": "true" # Ensure observations have photos
+        "order_by": "id"
     }
     if taxa_ids and len(taxa_ids) > 0:
         params["taxon_id"] = ",".join(map(str, taxa_ids))
-        
-    async with session.get(url, params=params, ssl=False) as response:
-        response.raise_for_status()
-        data = await response.json()
-        print(f"iNaturalist observations response: {data}")
-        
-        if not data or 'results' not in data:
-            return []
-        
-        # Format the results for the frontend
-        formatted_results = []
-        for obs in data.get("results", []):
-            if not obs or not obs.get("photos"):
-                continue
-            
-            # Filter out observations without titles/species_guess
-            species_guess = obs.get("species_guess") or ""
-            if not species_guess or not species_guess.strip() or species_guess.strip().lower() in ["unknown", "n/a", "unidentified"]:
+
+    coordinates = {}
+    for _ in range(max_pages):
+        with metrics.span("observation_fetch"):
+            data = await upstream.get_json(session, url, params)
+
+        results = data.get("results", []) if data else []
+        for obs in results:
+            location = obs.get("location")
+            if not location:
                 continue
-            species_guess = species_guess.strip()
-                
             try:
-                # Get location coordinates
-                location = obs.get("location")
-                lat, lon = None, None
-                if location:
-                    try:
-                        lat, lon = map(float, location.split(","))
-                    except (ValueError, AttributeError):
-                        pass
-                
-                formatted_results.append({
-                    "id": obs.get("id", "N/A"),
-                    "species_guess": species_guess,
-                    "iconic_taxon_name": obs.get("taxon", {}).get("iconic_taxon_name", "Unknown") if obs.get("taxon") else "Unknown",
-                    "photo_url": obs["photos"][0]["url"].replace("square", "medium") if obs.get("photos") and len(obs["photos"]) > 0 else None,
-                    "observation_url": obs.get("uri", "#"),
-                    "latitude": lat,
-                    "longitude": lon
-                })
-            except Exception as e:
-                print(f"Error formatting observation: {e}")
+                lat, lon = map(float, location.split(","))
+            except (ValueError, AttributeError):
                 continue
-        
-        return formatted_results
+            coordinates[obs["id"]] = (lon, lat)
+
+        if len(results) < params["per_page"]:
+            return coordinates, True
+        params["id_below"] = results[-1]["id"]
+
+    return coordinates, False
+
+async def get_observation_coordinates(session: aiohttp.ClientSession, bounds: tuple, taxa_ids: list[int] | None) -> tuple:
+    """Gets observation coordinates across a whole search area with a few tiled, paginated queries.
+
+    Returns (lons, lats, complete); complete is False if any tile had more
+    observations than the page budget allowed.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    lon_edges = np.linspace(min_lon, max_lon, BULK_SCORE_TILES + 1)
+    lat_edges = np.linspace(min_lat, max_lat, BULK_SCORE_TILES + 1)
+    tiles = [
+        (lon_edges[i], lat_edges[j], lon_edges[i + 1], lat_edges[j + 1])
+        for j in range(BULK_SCORE_TILES)
+        for i in range(BULK_SCORE_TILES)
+    ]
+    results = await asyncio.gather(*(
+        _get_tile_observation_coordinates(session, tile, taxa_ids, BULK_SCORE_MAX_PAGES)
+        for tile in tiles
+    ))
+
+    # Tiles share edges, so merge by observation ID to avoid double counting
+    coordinates = {}
+    for tile_coordinates, _ in results:
+        coordinates.update(tile_coordinates)
+    complete = all(tile_complete for _, tile_complete in results)
+    logger.info("Bulk scoring fetched %d observations over %d tiles (complete=%s)", len(coordinates), len(tiles), complete)
+    if not coordinates:
+        return np.empty(0), np.empty(0), complete
+    lons, lats = np.array(list(coordinates.values())).T
+    return lons, lats, complete
+
+def prime_presence_cache(chunks: list, counts: list[int], taxa_ids: list[int] | None, complete: bool):
+    """Records bulk-scored chunks in the presence cache so later checks skip the API.
+
+    Empty chunks are only recorded when every tile was fully paged.
+    """
+    _chunk_cache.set_many([
+        (_get_cache_key(chunk, taxa_ids), count > 0)
+        for chunk, count in zip(chunks, counts)
+        if count > 0 or complete
+    ])
+
+_PLACEHOLDER_GUESSES = {"unknown", "n/a", "unidentified"}
+
+def _format_observations(results: list) -> list[dict]:
+    """Format the results for the frontend.
+
+    Picks the handful of fields the frontend uses in a single pass, skipping
+    observations without photos or with a placeholder species guess.
+    """
+    formatted_results = []
+    append = formatted_results.append
+    for obs in results:
+        if not obs:
+            continue
+        photos = obs.get("photos")
+        if not photos:
+            continue
+        species_guess = (obs.get("species_guess") or "").strip()
+        if not species_guess or species_guess.lower() in _PLACEHOLDER_GUESSES:
+            continue
+        photo_url = photos[0].get("url")
+        if not isinstance(photo_url, str):
+            logger.warning("Skipping observation %s without a photo URL", obs.get("id"))
+            continue
+
+        lat = lon = None
+        location = obs.get("location")
+        if location:
+            lat_text, _, lon_text = location.partition(",")
+            try:
+                lat, lon = float(lat_text), float(lon_text)
+            except ValueError:
+                lat = lon = None
+
+        taxon = obs.get("taxon")
+        append({
+            "id": obs.get("id", "N/A"),
+            "species_guess": species_guess,
+            "iconic_taxon_name": taxon.get("iconic_taxon_name", "Unknown") if taxon else "Unknown",
+            "photo_url": photo_url.replace("square", "medium"),
+            "observation_url": obs.get("uri", "#"),
+            "latitude": lat,
+            "longitude": lon,
+        })
+
+    return formatted_results
+
+def encode_cursor(id_below: int, remaining: int) -> str:
+    """Opaque continuation token for the observations after id_below."""
+    return base64.urlsafe_b64encode(orjson.dumps([id_below, remaining])).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    """Parses a continuation token into (id_below, remaining). Raises ValueError if malformed."""
+    try:
+        id_below, remaining = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(id_below, int) or not isinstance(remaining, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return id_below, remaining
+
+async def _get_observation_page(session: aiohttp.ClientSession, chunk_bounds: tuple, taxa_ids: list[int] | None,
+                                id_below: int | None = None, page: int = 1) -> dict:
+    min_lon, min_lat, max_lon, max_lat = chunk_bounds
+    url = f"{INATURALIST_API_URL}/observations"
+    params = {
+        "nelat": max_lat,
+        "nelng": max_lon,
+        "swlat": min_lat,
+        "swlng": min_lon,
+        "verifiable": "true",
+        "per_page": OBSERVATION_PAGE_SIZE,
+        "order": "desc",
+        "order_by": "id", # Stable order for the id_below cursor
+        "photos": "true" # Ensure observations have photos
+    }
+    if taxa_ids and len(taxa_ids) > 0:
+        params["taxon_id"] = ",".join(map(str, taxa_ids))
+    if id_below is not None:
+        params["id_below"] = id_below
+    if page > 1:
+        params["page"] = page
+
+    with metrics.span("observation_fetch"):
+        data = await upstream.get_json(session, url, params)
+    logger.debug("iNaturalist observations response with %d results", len(data.get("results", [])) if data else 0)
+    return data or {}
+
+async def get_observations_page(session: aiohttp.ClientSession, chunk_bounds: tuple, taxa_ids: list[int] | None,
+                                cursor: str | None = None) -> dict:
+    """Gets a page of verifiable observations for a chunk, newest first, with caching.
+
+    Without a cursor this is the first page (up to OBSERVATION_PAGE_SIZE raw
+    observations). With one, the next OBSERVATION_MAX_PAGES pages after it are
+    fetched concurrently: the cursor pins id_below, so new observations can't
+    shift the pages under us. Returns {"observations": [...], "nextCursor": token
+    or None}. Pages served from the local observation store have no cursor.
+    """
+    kind = "observations" if cursor is None else f"observations:{cursor}"
+    cache_key = _get_cache_key(chunk_bounds, taxa_ids, kind)
+    cached_page = await _chunk_cache.aget(cache_key)
+    if cached_page is not None:
+        logger.debug("Cache HIT for chunk observations %s", chunk_bounds[:2])
+        return cached_page
+
+    if cursor is None:
+        # Local observation store, if configured
+        if observation_store.enabled():
+            with metrics.span("observation_store_lookup"):
+                stored_observations = await observation_store.get_observations(chunk_bounds, taxa_ids)
+            if stored_observations or observation_store.OBSERVATION_STORE_FALLBACK != "live":
+                result = {"observations": stored_observations, "nextCursor": None}
+                _chunk_cache.set(cache_key, result)
+                return result
+
+        data = await _get_observation_page(session, chunk_bounds, taxa_ids)
+        if "results" not in data:
+            return {"observations": [], "nextCursor": None}
+        raw_results = data["results"]
+        remaining = data.get("total_results", 0) - len(raw_results)
+        if len(raw_results) < OBSERVATION_PAGE_SIZE:
+            remaining = 0
+    else:
+        id_below, remaining = decode_cursor(cursor)
+        page_count = min(OBSERVATION_MAX_PAGES, max(1, -(-remaining // OBSERVATION_PAGE_SIZE)))
+        pages = await asyncio.gather(*(
+            _get_observation_page(session, chunk_bounds, taxa_ids, id_below, page)
+            for page in range(1, page_count + 1)
+        ))
+        raw_results = [obs for data in pages for obs in data.get("results", [])]
+        remaining -= len(raw_results)
+        if len(pages[-1].get("results", [])) < OBSERVATION_PAGE_SIZE:
+            remaining = 0
+
+    next_cursor = None
+    if remaining > 0 and raw_results:
+        next_cursor = encode_cursor(min(obs["id"] for obs in raw_results), remaining)
+
+    with metrics.span("formatting"):
+        result = {"observations": _format_observations(raw_results), "nextCursor": next_cursor}
+
+    _chunk_cache.set(cache_key, result)
+    return result
+
+async def get_observations_in_chunk(session: aiohttp.ClientSession, chunk_bounds: tuple, taxa_ids: list[int] | None):
+    """Gets the first page of verifiable observations for a given chunk with caching."""
+    return (await get_observations_page(session, chunk_bounds, taxa_ids))["observations"]
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import orjson
+
+# Local land-cover raster tile set. The directory holds an index.json:
+#   {
+#     "green_classes": [1, 2],
+#     "tiles": [{"file": "tile.bin", "bounds": [min_lon, min_lat, max_lon, max_lat],
+#                "shape": [rows, cols], "dtype": "uint8"}]
+#   }
+# Each tile is a raw row-major raster (row 0 at the northern edge) of class
+# codes. Summed-area tables are built next to each tile as <file>.sat. Tiles
+# and their tables are memory-mapped, so the OS page cache holds whatever is
+# hot and nothing is ever loaded whole.
+LANDCOVER_DATA_PATH = os.getenv("LANDCOVER_DATA_PATH")
+
+SAT_BUILD_BLOCK_ROWS = 1024
+# Summed-area table files start with this magic and a hash of their inputs
+SAT_MAGIC = b"SAT1"
+SAT_HEADER_BYTES = 64
+
+class LandCoverTile:
+    """One memory-mapped raster tile and its summed-area table of green pixels."""
+
+    def __init__(self, directory: str, spec: dict, green_classes: list[int]):
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = spec["bounds"]
+        self.rows, self.cols = spec["shape"]
+        self.pixel_width = (self.max_lon - self.min_lon) / self.cols
+        self.pixel_height = (self.max_lat - self.min_lat) / self.rows
+
+        path = os.path.join(directory, spec["file"])
+        self.raster = np.memmap(path, dtype=spec.get("dtype", "uint8"), mode="r", shape=(self.rows, self.cols))
+        self.sat = self._load_sat(path + ".sat", green_classes)
+
+    def _load_sat(self, sat_path: str, green_classes: list[int]) -> np.ndarray:
+        """Opens the tile's summed-area table, building it next to the tile if missing or stale.
+
+        The file starts with a header holding a hash of the table's inputs
+        (raster size and mtime, green classes); a table whose header doesn't
+        match is rebuilt. It is built in a temporary file, header last, and
+        moved into place, so a crashed or concurrent build is never read.
+        """
+        shape = (self.rows + 1, self.cols + 1)
+        raster_stat = os.stat(self.raster.filename)
+        key = orjson.dumps({
+            "shape": list(shape),
+            "raster_size": raster_stat.st_size,
+            "raster_mtime_ns": raster_stat.st_mtime_ns,
+            "green_classes": sorted(green_classes),
+        }, option=orjson.OPT_SORT_KEYS)
+        header = (SAT_MAGIC + hashlib.blake2b(key, digest_size=32).digest()).ljust(SAT_HEADER_BYTES, b"\0")
+        if self._has_sat(sat_path, header, SAT_HEADER_BYTES + shape[0] * shape[1] * 4):
+            return np.memmap(sat_path, dtype=np.uint32, mode="r", offset=SAT_HEADER_BYTES, shape=shape)
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(sat_path) + ".", suffix=".tmp", dir=os.path.dirname(sat_path))
+        except OSError:
+            # Read-only data directory: keep the table in memory instead
+            sat = np.zeros(shape, dtype=np.uint32)
+            self._build_sat(sat, green_classes)
+            return sat
+
+        try:
+            os.close(fd)
+            sat = np.memmap(tmp_path, dtype=np.uint32, mode="w+", offset=SAT_HEADER_BYTES, shape=shape)
+            self._build_sat(sat, green_classes)
+            sat.flush()
+            del sat
+            with open(tmp_path, "r+b") as f:
+                f.write(header)
+            os.replace(tmp_path, sat_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return np.memmap(sat_path, dtype=np.uint32, mode="r", offset=SAT_HEADER_BYTES, shape=shape)
+
+    @staticmethod
+    def _has_sat(sat_path: str, header: bytes, size: int) -> bool:
+        try:
+            with open(sat_path, "rb") as f:
+                return f.read(len(header)) == header and os.fstat(f.fileno()).st_size == size
+        except OSError:
+            return False
+
+    def _build_sat(self, sat: np.ndarray, green_classes: list[int]):
+        # Built in row blocks so the raster is streamed, never loaded whole
+        running = np.zeros(self.cols, dtype=np.uint64)
+        for start in range(0, self.rows, SAT_BUILD_BLOCK_ROWS):
+            green = np.isin(self.raster[start:start + SAT_BUILD_BLOCK_ROWS], green_classes)
+            block = green.cumsum(axis=1, dtype=np.uint64).cumsum(axis=0) + running
+            sat[start + 1:start + 1 + len(block), 1:] = block
+            running = block[-1]
+
+    def window_sums(self, bounds: np.ndarray) -> tuple:
+        """Green and total pixel counts for each (min_lon, min_lat, max_lon, max_lat) row of bounds."""
+        col0 = np.clip(np.floor((bounds[:, 0] - self.min_lon) / self.pixel_width), 0, self.cols).astype(np.intp)
+        col1 = np.clip(np.ceil((bounds[:, 2] - self.min_lon) / self.pixel_width), 0, self.cols).astype(np.intp)
+        row0 = np.clip(np.floor((self.max_lat - bounds[:, 3]) / self.pixel_height), 0, self.rows).astype(np.intp)
+        row1 = np.clip(np.ceil((self.max_lat - bounds[:, 1]) / self.pixel_height), 0, self.rows).astype(np.intp)
+        col1 = np.maximum(col0, col1)
+        row1 = np.maximum(row0, row1)
+
+        sat = self.sat
+        green = (sat[row1, col1].astype(np.int64) - sat[row0, col1] - sat[row1, col0] + sat[row0, col0])
+        total = (row1 - row0).astype(np.int64) * (col1 - col0)
+        return green, total
+
+class LandCoverTileSet:
+    """Green-cover lookups over a directory of land-cover tiles."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "index.json")) as f:
+            index = json.load(f)
+        green_classes = index["green_classes"]
+        self.tiles = [LandCoverTile(directory, spec, green_classes) for spec in index["tiles"]]
+
+    def green_percentage(self, chunks) -> np.ndarray:
+        """Percentage of green pixels in each chunk, in O(1) per chunk and tile.
+
+        Chunks not covered by any tile get NaN.
+        """
+        bounds = np.asarray(chunks, dtype=float).reshape(-1, 4)
+        green = np.zeros(len(bounds), dtype=np.int64)
+        total = np.zeros(len(bounds), dtype=np.int64)
+        for tile in self.tiles:
+            overlaps = (
+                (bounds[:, 0] < tile.max_lon) & (bounds[:, 2] > tile.min_lon)
+                & (bounds[:, 1] < tile.max_lat) & (bounds[:, 3] > tile.min_lat)
+            )
+            if not overlaps.any():
+                continue
+            tile_green, tile_total = tile.window_sums(bounds[overlaps])
+            green[overlaps] += tile_green
+            total[overlaps] += tile_total
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, green * 100.0 / total, np.nan)
+
+_tileset = LandCoverTileSet(LANDCOVER_DATA_PATH) if LANDCOVER_DATA_PATH else None
+
+def get_tileset() -> LandCoverTileSet | None:
+    """The configured land-cover tile set, or None when LANDCOVER_DATA_PATH is unset."""
+    return _tileset
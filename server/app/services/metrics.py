@@ -0,0 +1,143 @@
+import time
+from contextlib import contextmanager
+
+# In-process latency histograms and counters, rendered in the Prometheus text
+# exposition format by the /metrics route.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = tuple(zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            count = series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(tuple(zip(self.label_names, label_values)))} {value}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "adventure_chunk_stage_duration_seconds",
+    "Time spent in each request-processing stage.",
+    ("stage",),
+)
+STAGE_ERRORS = Counter(
+    "adventure_chunk_stage_errors_total",
+    "Stage executions that raised an exception.",
+    ("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "adventure_chunk_http_request_duration_seconds",
+    "End-to-end API request latency.",
+    ("method", "route", "status"),
+)
+
+@contextmanager
+def span(stage: str):
+    """Times the enclosed block into the per-stage latency histogram.
+
+    Works around awaits too: `with metrics.span("isochrone_fetch"): await ...`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+def _samples(name: str, documentation: str, samples: list[tuple], metric_type: str = "gauge") -> list[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in samples)
+    return lines
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from app.services import cache, prefetch, upstream
+
+    lines = STAGE_SECONDS.render() + STAGE_ERRORS.render() + REQUEST_SECONDS.render()
+
+    cache_stats = cache.get_all_stats().values()
+    for key, metric_type, documentation in (
+        ("hits", "counter", "Cache lookups that found a live entry."),
+        ("misses", "counter", "Cache lookups that found nothing or an expired entry."),
+        ("evictions", "counter", "Entries evicted to stay within size or memory limits."),
+        ("size", "gauge", "Entries currently cached."),
+        ("bytes", "gauge", "Estimated memory held by cached entries."),
+    ):
+        name = f"adventure_chunk_cache_{key}" + ("_total" if metric_type == "counter" else "")
+        lines += _samples(name, documentation, [((("cache", s["name"]),), s[key]) for s in cache_stats], metric_type)
+
+    upstream_stats = upstream.get_upstream_stats().items()
+    for key, metric_type, documentation in (
+        ("requests", "counter", "Requests sent to the upstream host."),
+        ("retries", "counter", "Requests retried after a 429 or 5xx."),
+        ("throttled", "counter", "429 responses received from the upstream host."),
+        ("coalesced", "counter", "Requests served by joining an identical in-flight call."),
+        ("queue_depth", "gauge", "Requests currently waiting on the rate limiter."),
+        ("avg_wait_seconds", "gauge", "Mean time requests waited on the rate limiter."),
+    ):
+        name = f"adventure_chunk_upstream_{key}" + ("_total" if metric_type == "counter" else "")
+        lines += _samples(name, documentation, [((("host", host),), s[key]) for host, s in upstream_stats], metric_type)
+
+    prefetch_stats = prefetch.get_prefetch_stats()
+    for key, metric_type, documentation in (
+        ("started", "counter", "Speculative observation prefetches started."),
+        ("completed", "counter", "Prefetches that stored a page in the observation cache."),
+        ("cancelled", "counter", "Prefetches cancelled or dropped because the prefetch budget was spent."),
+        ("hits", "counter", "Prefetched pages later requested by a client."),
+        ("hit_rate", "gauge", "Share of completed prefetches later requested by a client."),
+    ):
+        name = f"adventure_chunk_prefetch_{key}" + ("_total" if metric_type == "counter" else "")
+        lines += _samples(name, documentation, [((), prefetch_stats[key])], metric_type)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,302 @@
+"""
+Local observation store: a SQLite database with an R-tree over observation
+coordinates, loaded from iNaturalist CSV exports or GBIF Darwin Core Archives.
+
+When OBSERVATION_STORE_PATH is set, chunk presence checks and observation
+listings are answered from the store. OBSERVATION_STORE_FALLBACK controls what
+happens when the store has nothing for a chunk: "live" (default) queries the
+iNaturalist API, "none" trusts the store.
+
+Ingest or incrementally update the store from the server directory:
+    python -m app.services.observation_store ingest observations.csv
+    python -m app.services.observation_store ingest dwca.zip --format dwca
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sqlite3
+import threading
+import zipfile
+
+OBSERVATION_STORE_PATH = os.getenv("OBSERVATION_STORE_PATH")
+OBSERVATION_STORE_FALLBACK = os.getenv("OBSERVATION_STORE_FALLBACK", "live")
+
+# Darwin Core ranks checked, most specific first, to derive the iconic taxon
+_DWC_ICONIC_RANKS = ("class", "phylum", "kingdom")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    species_guess TEXT,
+    iconic_taxon_name TEXT,
+    photo_url TEXT,
+    observation_url TEXT,
+    observed_on TEXT,
+    updated_at TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS observations_rtree USING rtree(
+    id, min_lon, max_lon, min_lat, max_lat
+);
+CREATE TABLE IF NOT EXISTS observation_taxa (
+    taxon_id INTEGER NOT NULL,
+    observation_id INTEGER NOT NULL,
+    PRIMARY KEY (taxon_id, observation_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source TEXT PRIMARY KEY,
+    last_updated_at TEXT,
+    rows_ingested INTEGER
+);
+"""
+
+# Same filters the live formatter applies to observation listings
+_LISTABLE = """
+    o.photo_url IS NOT NULL AND o.photo_url != ''
+    AND trim(coalesce(o.species_guess, '')) != ''
+    AND lower(trim(o.species_guess)) NOT IN ('unknown', 'n/a', 'unidentified')
+"""
+
+def enabled() -> bool:
+    return bool(OBSERVATION_STORE_PATH)
+
+def connect(path: str, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+_readers = threading.local()  # path -> read-only connection, per worker thread
+
+def _reader(path: str) -> sqlite3.Connection:
+    """This thread's read-only connection to the store, opened once and reused."""
+    connections = getattr(_readers, "connections", None)
+    if connections is None:
+        connections = _readers.connections = {}
+    if path not in connections:
+        connections[path] = connect(path, read_only=True)
+    return connections[path]
+
+def _bounds_query(chunk_bounds: tuple, taxa_ids: list[int] | None) -> tuple:
+    """FROM/WHERE clause and parameters selecting observations in a chunk, optionally by taxa."""
+    min_lon, min_lat, max_lon, max_lat = chunk_bounds
+    # The R-tree stores float32 boxes rounded outward, so it is only used to
+    # find overlapping candidates; the exact coordinates decide, half-open so
+    # a point on an edge shared by two chunks belongs to exactly one of them
+    sql = """
+        FROM observations_rtree r JOIN observations o ON o.id = r.id
+        WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ?
+          AND o.longitude >= ? AND o.longitude < ? AND o.latitude >= ? AND o.latitude < ?
+    """
+    params = [min_lon, max_lon, min_lat, max_lat, min_lon, max_lon, min_lat, max_lat]
+    if taxa_ids:
+        placeholders = ",".join("?" * len(taxa_ids))
+        sql += f" AND o.id IN (SELECT observation_id FROM observation_taxa WHERE taxon_id IN ({placeholders}))"
+        params.extend(int(taxon_id) for taxon_id in taxa_ids)
+    return sql, params
+
+def _has_observations(path: str, chunk_bounds: tuple, taxa_ids: list[int] | None) -> bool:
+    sql, params = _bounds_query(chunk_bounds, taxa_ids)
+    return _reader(path).execute(f"SELECT 1 {sql} LIMIT 1", params).fetchone() is not None
+
+def _get_observations(path: str, chunk_bounds: tuple, taxa_ids: list[int] | None, limit: int) -> list[dict]:
+    sql, params = _bounds_query(chunk_bounds, taxa_ids)
+    query = f"""
+        SELECT o.id, trim(o.species_guess), coalesce(o.iconic_taxon_name, 'Unknown'), o.photo_url,
+               coalesce(o.observation_url, '#'), o.latitude, o.longitude
+        {sql} AND {_LISTABLE}
+        ORDER BY o.observed_on DESC LIMIT ?
+    """
+    rows = _reader(path).execute(query, params + [limit]).fetchall()
+    return [
+        {
+            "id": obs_id,
+            "species_guess": species_guess,
+            "iconic_taxon_name": iconic_taxon_name,
+            "photo_url": photo_url,
+            "observation_url": observation_url,
+            "latitude": lat,
+            "longitude": lon,
+        }
+        for obs_id, species_guess, iconic_taxon_name, photo_url, observation_url, lat, lon in rows
+    ]
+
+async def has_observations(chunk_bounds: tuple, taxa_ids: list[int] | None) -> bool:
+    """Whether the store holds at least one observation in the chunk."""
+    return await asyncio.to_thread(_has_observations, OBSERVATION_STORE_PATH, chunk_bounds, taxa_ids)
+
+async def get_observations(chunk_bounds: tuple, taxa_ids: list[int] | None, limit: int = 200) -> list[dict]:
+    """Listable observations in the chunk, newest first, formatted like the live API results."""
+    return await asyncio.to_thread(_get_observations, OBSERVATION_STORE_PATH, chunk_bounds, taxa_ids, limit)
+
+def _ancestor_ids(value: str | None) -> list[int]:
+    """Parses taxon ancestry given as '48460/1/2/3' or '48460,1,2,3'."""
+    if not value:
+        return []
+    return [int(part) for part in value.replace(",", "/").split("/") if part.strip().isdigit()]
+
+def _taxon_id_from_url(value: str | None) -> int | None:
+    """Taxon ID from a bare ID or an iNaturalist taxon URL (as used in DwC taxonID)."""
+    if not value:
+        return None
+    tail = value.rstrip("/").rsplit("/", 1)[-1]
+    return int(tail) if tail.isdigit() else None
+
+def _inaturalist_records(path: str):
+    """Rows of an iNaturalist CSV export as (record, taxon_ids)."""
+    from app.services.inaturalist_service import ICONIC_TAXA
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if not row.get("latitude") or not row.get("longitude"):
+                continue
+            if row.get("quality_grade") == "casual":
+                continue  # Not verifiable
+            iconic_taxon_name = row.get("iconic_taxon_name") or None
+            taxon_ids = _ancestor_ids(row.get("taxon_ancestry") or row.get("ancestry"))
+            if row.get("taxon_id", "").isdigit():
+                taxon_ids.append(int(row["taxon_id"]))
+            if iconic_taxon_name in ICONIC_TAXA:
+                taxon_ids.append(ICONIC_TAXA[iconic_taxon_name])
+            yield {
+                "id": int(row["id"]),
+                "latitude": float(row["latitude"]),
+                "longitude": float(row["longitude"]),
+                "species_guess": row.get("species_guess") or row.get("common_name") or row.get("scientific_name"),
+                "iconic_taxon_name": iconic_taxon_name,
+                "photo_url": (row.get("image_url") or "").replace("square", "medium") or None,
+                "observation_url": row.get("url"),
+                "observed_on": row.get("observed_on"),
+                "updated_at": row.get("updated_at"),
+            }, taxon_ids
+
+def _dwca_records(path: str):
+    """Occurrences of a Darwin Core Archive (occurrence.txt + multimedia.txt) as (record, taxon_ids)."""
+    from app.services.inaturalist_service import ICONIC_TAXA
+    with zipfile.ZipFile(path) as archive:
+        photos = {}
+        if "multimedia.txt" in archive.namelist():
+            with archive.open("multimedia.txt") as f:
+                for row in csv.DictReader(io.TextIOWrapper(f, encoding="utf-8"), delimiter="\t", quoting=csv.QUOTE_NONE):
+                    photos.setdefault(row.get("gbifID") or row.get("coreid") or row.get("id"), row.get("identifier"))
+
+        with archive.open("occurrence.txt") as f:
+            for row in csv.DictReader(io.TextIOWrapper(f, encoding="utf-8"), delimiter="\t", quoting=csv.QUOTE_NONE):
+                if not row.get("decimalLatitude") or not row.get("decimalLongitude"):
+                    continue
+                obs_id = row.get("catalogNumber") or row.get("gbifID") or row.get("id")
+                if not obs_id or not obs_id.isdigit():
+                    continue
+                iconic_taxon_name = next(
+                    (row[rank] for rank in _DWC_ICONIC_RANKS if row.get(rank) in ICONIC_TAXA), None
+                )
+                taxon_ids = []
+                taxon_id = _taxon_id_from_url(row.get("taxonID"))
+                if taxon_id is not None:
+                    taxon_ids.append(taxon_id)
+                if iconic_taxon_name:
+                    taxon_ids.append(ICONIC_TAXA[iconic_taxon_name])
+                core_id = row.get("gbifID") or row.get("id")
+                yield {
+                    "id": int(obs_id),
+                    "latitude": float(row["decimalLatitude"]),
+                    "longitude": float(row["decimalLongitude"]),
+                    "species_guess": row.get("vernacularName") or row.get("scientificName"),
+                    "iconic_taxon_name": iconic_taxon_name,
+                    "photo_url": photos.get(core_id),
+                    "observation_url": row.get("references") or row.get("occurrenceID"),
+                    "observed_on": row.get("eventDate"),
+                    "updated_at": row.get("modified"),
+                }, taxon_ids
+
+def ingest(db_path: str, source_path: str, source_format: str = "inaturalist", batch_size: int = 5000) -> int:
+    """Loads an export into the store, skipping rows not updated since they were last ingested.
+
+    Re-running on a newer export of the same source only rewrites changed rows.
+    Returns the number of rows written.
+    """
+    records = _dwca_records(source_path) if source_format == "dwca" else _inaturalist_records(source_path)
+    source = os.path.basename(source_path)
+    connection = connect(db_path)
+    written = 0
+    newest = None
+    try:
+        batch = []
+        for record, taxon_ids in records:
+            updated_at = record["updated_at"]
+            if updated_at and (newest is None or updated_at > newest):
+                newest = updated_at
+            batch.append((record, taxon_ids))
+            if len(batch) >= batch_size:
+                written += _write_batch(connection, batch)
+                batch = []
+        if batch:
+            written += _write_batch(connection, batch)
+
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO ingest_state (source, last_updated_at, rows_ingested) VALUES (?, ?, "
+                "coalesce((SELECT rows_ingested FROM ingest_state WHERE source = ?), 0) + ?)",
+                (source, newest, source, written),
+            )
+    finally:
+        connection.close()
+    return written
+
+def _write_batch(connection: sqlite3.Connection, batch: list) -> int:
+    """Upserts a batch of records, leaving rows whose updated_at hasn't moved untouched."""
+    previous = {}
+    ids = [record["id"] for record, _ in batch]
+    for start in range(0, len(ids), 500):
+        chunk_ids = ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk_ids))
+        previous.update(connection.execute(
+            f"SELECT id, updated_at FROM observations WHERE id IN ({placeholders})", chunk_ids
+        ))
+    batch = [
+        (record, taxon_ids) for record, taxon_ids in batch
+        if not (previous.get(record["id"]) and record["updated_at"] and record["updated_at"] <= previous[record["id"]])
+    ]
+    if not batch:
+        return 0
+
+    ids = [(record["id"],) for record, _ in batch]
+    with connection:
+        connection.executemany("DELETE FROM observations_rtree WHERE id = ?", ids)
+        connection.executemany("DELETE FROM observation_taxa WHERE observation_id = ?", ids)
+        connection.executemany(
+            "INSERT OR REPLACE INTO observations (id, latitude, longitude, species_guess, iconic_taxon_name, "
+            "photo_url, observation_url, observed_on, updated_at) "
+            "VALUES (:id, :latitude, :longitude, :species_guess, :iconic_taxon_name, "
+            ":photo_url, :observation_url, :observed_on, :updated_at)",
+            [record for record, _ in batch],
+        )
+        connection.executemany(
+            "INSERT INTO observations_rtree (id, min_lon, max_lon, min_lat, max_lat) VALUES (?, ?, ?, ?, ?)",
+            [(r["id"], r["longitude"], r["longitude"], r["latitude"], r["latitude"]) for r, _ in batch],
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO observation_taxa (taxon_id, observation_id) VALUES (?, ?)",
+            [(taxon_id, record["id"]) for record, taxon_ids in batch for taxon_id in set(taxon_ids)],
+        )
+    return len(batch)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local observation store.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subcommands.add_parser("ingest", help="Load or update the store from an export")
+    ingest_parser.add_argument("source", help="iNaturalist CSV export or GBIF DwC-A zip")
+    ingest_parser.add_argument("--format", choices=["inaturalist", "dwca"], default="inaturalist")
+    ingest_parser.add_argument("--db", default=OBSERVATION_STORE_PATH or "observations.sqlite3",
+                               help="Store path (defaults to OBSERVATION_STORE_PATH)")
+    args = parser.parse_args()
+
+    written = ingest(args.db, args.source, args.format)
+    print(f"Ingested {written} new or updated observations into {args.db}")
+
+if __name__ == "__main__":
+    main()
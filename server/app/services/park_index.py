@@ -0,0 +1,93 @@
+import json
+import os
+import numpy as np
+import shapely
+from shapely.geometry import box, shape
+from shapely.strtree import STRtree
+
+# Park and green-space areas, loaded once and indexed per category. Point
+# features are circles of `radius` degrees around the point; Polygon and
+# MultiPolygon features are used as-is.
+PARKS_DATA_PATH = os.getenv("PARKS_DATA_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "parks.geojson"
+)
+
+class ParkIndex:
+    """STRtree over the park areas of one category, answering batched point queries."""
+
+    def __init__(self, features: list[dict]):
+        tree_geoms = []
+        center_lons, center_lats, radii = [], [], []
+        for feature in features:
+            geometry = shape(feature["geometry"])
+            radius = feature["properties"].get("radius")
+            if geometry.geom_type == "Point" and radius is not None:
+                # Index the circle's bounding box; hits are confirmed by exact distance
+                tree_geoms.append(box(geometry.x - radius, geometry.y - radius, geometry.x + radius, geometry.y + radius))
+                center_lons.append(geometry.x)
+                center_lats.append(geometry.y)
+                radii.append(radius)
+            else:
+                shapely.prepare(geometry)
+                tree_geoms.append(geometry)
+                center_lons.append(np.nan)
+                center_lats.append(np.nan)
+                radii.append(np.nan)
+
+        self.names = [feature["properties"].get("name") for feature in features]
+        self.geoms = np.array(tree_geoms, dtype=object)
+        self.center_lons = np.array(center_lons, dtype=float)
+        self.center_lats = np.array(center_lats, dtype=float)
+        self.radii = np.array(radii, dtype=float)
+        self.tree = STRtree(self.geoms)
+
+    def __len__(self) -> int:
+        return len(self.geoms)
+
+    def contains(self, lons, lats, inclusive: bool = True) -> np.ndarray:
+        """Boolean array: whether each point falls inside any area in this index.
+
+        Circles include their boundary when inclusive is True (distance <= radius),
+        otherwise only points strictly closer than the radius count.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        result = np.zeros(lons.shape, dtype=bool)
+        if len(self.geoms) == 0 or lons.size == 0:
+            return result
+
+        point_index, area_index = self.tree.query(shapely.points(lons, lats))
+        if point_index.size == 0:
+            return result
+        x = lons[point_index]
+        y = lats[point_index]
+
+        is_circle = ~np.isnan(self.radii[area_index])
+        dx = x - self.center_lons[area_index]
+        dy = y - self.center_lats[area_index]
+        distance = np.sqrt(dx * dx + dy * dy)
+        radius = self.radii[area_index]
+        hits = np.where(is_circle, distance <= radius if inclusive else distance < radius, False)
+
+        polygons = ~is_circle
+        if polygons.any():
+            hits[polygons] = shapely.intersects_xy(self.geoms[area_index[polygons]], x[polygons], y[polygons])
+
+        result[point_index[hits]] = True
+        return result
+
+def load_park_indexes(path: str = PARKS_DATA_PATH) -> dict[str, ParkIndex]:
+    """Reads the park GeoJSON and builds one ParkIndex per feature category."""
+    with open(path) as f:
+        features = json.load(f)["features"]
+    by_category = {}
+    for feature in features:
+        by_category.setdefault(feature["properties"]["category"], []).append(feature)
+    return {category: ParkIndex(items) for category, items in by_category.items()}
+
+_indexes = load_park_indexes()
+_empty_index = ParkIndex([])
+
+def get_index(category: str) -> ParkIndex:
+    """Returns the index for a category ("major_park", "green_space" or "parkland")."""
+    return _indexes.get(category, _empty_index)
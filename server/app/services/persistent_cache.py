@@ -0,0 +1,159 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# Second cache tier behind the in-memory TTLCaches, shared by every worker on
+# the host and surviving restarts. Off unless PERSISTENT_CACHE_PATH is set (or
+# a backend is installed with set_backend).
+PERSISTENT_CACHE_PATH = os.getenv("PERSISTENT_CACHE_PATH")
+# How long a read or write waits on another worker's lock before giving up;
+# a miss or a dropped write is cheaper than a stalled request
+PERSISTENT_CACHE_BUSY_TIMEOUT_MS = int(os.getenv("PERSISTENT_CACHE_BUSY_TIMEOUT_MS", "100"))
+# Writes waiting for the write-behind thread; further writes are dropped
+PERSISTENT_CACHE_WRITE_QUEUE = int(os.getenv("PERSISTENT_CACHE_WRITE_QUEUE", "1024"))
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """Interface for a shared cache tier.
+
+    Values are opaque bytes (the TTLCache encodes them) stored per namespace
+    with an absolute expiry in Unix time, so entries stay valid across
+    processes and restarts. Calls may block; they are made from worker
+    threads, never the event loop, so implementations must be safe to call
+    from several threads and processes at once.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> tuple[bytes, float] | None:
+        """(value, expires_at) for a live entry, or None."""
+
+    @abstractmethod
+    def set_many(self, namespace: str, items: list[tuple[str, bytes]], expires_at: float):
+        pass
+
+    def set(self, namespace: str, key: str, value: bytes, expires_at: float):
+        self.set_many(namespace, [(key, value)], expires_at)
+
+    def sweep(self) -> int:
+        """Deletes expired entries and returns how many were dropped."""
+        return 0
+
+    def close(self):
+        pass
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache tier in a local SQLite file in WAL mode, shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily, one per thread, so each worker process and thread gets its own connection
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=PERSISTENT_CACHE_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_entries_expires_at ON cache_entries (expires_at)")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, namespace: str, key: str) -> tuple[bytes, float] | None:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_many(self, namespace: str, items: list[tuple[str, bytes]], expires_at: float):
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(namespace, key, value, expires_at) for key, value in items],
+            )
+
+    def sweep(self) -> int:
+        return self._connect().execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+_backend: CacheBackend | None = SQLiteCacheBackend(PERSISTENT_CACHE_PATH) if PERSISTENT_CACHE_PATH else None
+_writes = queue.Queue(maxsize=PERSISTENT_CACHE_WRITE_QUEUE)
+_writer: threading.Thread | None = None
+_writer_lock = threading.Lock()
+
+def get_backend() -> CacheBackend | None:
+    """The configured shared cache tier, or None when it is disabled."""
+    return _backend
+
+def write_behind(backend: CacheBackend, namespace: str, items: list[tuple[str, bytes]], expires_at: float):
+    """Queues a set_many for the background writer thread, so callers never wait on the disk.
+
+    Writes are dropped, with a warning, while the queue is full.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_forever, name="persistent-cache-writer", daemon=True)
+            _writer.start()
+    try:
+        _writes.put_nowait((backend, namespace, items, expires_at))
+    except queue.Full:
+        logger.warning("Shared cache write queue full; dropped %d entries for '%s'", len(items), namespace)
+
+def _write_forever():
+    while True:
+        write = _writes.get()
+        if write is None:
+            return
+        backend, namespace, items, expires_at = write
+        try:
+            backend.set_many(namespace, items, expires_at)
+        except Exception as e:
+            logger.warning("Shared cache write failed for '%s': %s", namespace, e)
+
+def close():
+    """Finishes queued writes and closes the shared cache tier's connections, if any."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            _writes.put(None)
+            _writer.join()
+        _writer = None
+    if _backend is not None:
+        _backend.close()
+
+def set_backend(backend: CacheBackend | None):
+    """Installs a different shared cache tier, e.g. one backed by Redis."""
+    global _backend
+    if _backend is not None:
+        _backend.close()
+    _backend = backend
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+
+from app.services import geo_service, http_client, inaturalist_service, upstream
+
+logger = logging.getLogger(__name__)
+
+# Speculative prefetch: after a chunk's observations are served, the first
+# observation page of its 8 neighbours (and after a roll, of the chunks the
+# next roll is likely to land on) is fetched into the observation cache in
+# the background. Off unless PREFETCH_ENABLED is set.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+# Prefetches started per second, with bursts of PREFETCH_BURST
+PREFETCH_RATE_PER_SECOND = float(os.getenv("PREFETCH_RATE_PER_SECOND", "0.5"))
+PREFETCH_BURST = float(os.getenv("PREFETCH_BURST", "8"))
+PREFETCH_MAX_QUEUE = int(os.getenv("PREFETCH_MAX_QUEUE", "16"))
+PREFETCH_ROLL_CANDIDATES = int(os.getenv("PREFETCH_ROLL_CANDIDATES", "3"))
+# Prefetched pages remembered for hit-rate accounting
+PREFETCH_TRACKED_PAGES = 2048
+
+class _Budget:
+    """Token bucket that refuses, rather than waits, when it is empty."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+_budget = _Budget(PREFETCH_RATE_PER_SECOND, PREFETCH_BURST)
+_pending = deque()  # (key, chunk, taxa_ids), oldest first
+_in_flight = {}  # task -> key
+_prefetched = OrderedDict()  # keys of prefetched pages not yet requested
+_stats = {"scheduled": 0, "started": 0, "completed": 0, "failed": 0, "dropped": 0, "cancelled": 0, "hits": 0}
+
+def _key(chunk: tuple, taxa_ids: list[int] | None) -> tuple:
+    return (geo_service.lattice_cell(chunk) or tuple(chunk), tuple(sorted(taxa_ids)) if taxa_ids else None)
+
+def record_request(chunk: tuple, taxa_ids: list[int] | None):
+    """Counts a prefetch hit if a chunk's first page being requested was prefetched and is still cached."""
+    if not PREFETCH_ENABLED:
+        return
+    key = _key(chunk, taxa_ids)
+    if _prefetched.pop(key, None) is not None and inaturalist_service.first_page_cached(chunk, taxa_ids):
+        _stats["hits"] += 1
+
+def schedule_neighbours(chunk: tuple, taxa_ids: list[int] | None):
+    """Prefetches the first observation page of the chunks around a chunk that was just served."""
+    if PREFETCH_ENABLED:
+        _schedule(geo_service.neighbouring_chunks(chunk), taxa_ids)
+
+def schedule_roll_candidates(chunks: list, taxa_ids: list[int] | None):
+    """Prefetches first pages for a few chunks the next roll over chunks may pick.
+
+    Rolls prefer chunks already known to have observations, so those go first;
+    known-empty chunks are skipped. Only a sample of chunks is looked at.
+    """
+    if not PREFETCH_ENABLED or PREFETCH_ROLL_CANDIDATES <= 0:
+        return
+    sample = random.sample(chunks, min(len(chunks), PREFETCH_ROLL_CANDIDATES * 8))
+    positives, unknown = [], []
+    for chunk in sample:
+        if inaturalist_service.first_page_cached(chunk, taxa_ids):
+            continue
+        presence = inaturalist_service.cached_presence(chunk, taxa_ids)
+        if presence:
+            positives.append(chunk)
+        elif presence is None:
+            unknown.append(chunk)
+    _schedule((positives + unknown)[:PREFETCH_ROLL_CANDIDATES], taxa_ids)
+
+def _schedule(chunks: list, taxa_ids: list[int] | None):
+    queued = {key for key, _, _ in _pending} | set(_in_flight.values())
+    for chunk in chunks:
+        key = _key(chunk, taxa_ids)
+        if key in queued or inaturalist_service.first_page_cached(chunk, taxa_ids):
+            continue
+        if len(_pending) >= PREFETCH_MAX_QUEUE:
+            # The newest clicks are the better predictions
+            _pending.popleft()
+            _stats["dropped"] += 1
+        _pending.append((key, chunk, taxa_ids))
+        queued.add(key)
+        _stats["scheduled"] += 1
+    _pump()
+
+def _pump():
+    while _pending and len(_in_flight) < PREFETCH_CONCURRENCY:
+        if not (upstream.has_spare_capacity(inaturalist_service.INATURALIST_API_URL) and _budget.take()):
+            # Budget spent: drop the backlog instead of letting it go stale
+            _stats["cancelled"] += len(_pending)
+            _pending.clear()
+            return
+        key, chunk, taxa_ids = _pending.popleft()
+        task = asyncio.ensure_future(_prefetch(chunk, taxa_ids))
+        _in_flight[task] = key
+        task.add_done_callback(_finished)
+        _stats["started"] += 1
+
+async def _prefetch(chunk: tuple, taxa_ids: list[int] | None):
+    # Prefetches are lowest priority: user requests that reach the rate
+    # limiter take the tokens of prefetches still waiting on it
+    upstream.mark_background()
+    await inaturalist_service.get_observations_page(http_client.get_shared_session(), chunk, taxa_ids)
+
+def _finished(task: asyncio.Task):
+    key = _in_flight.pop(task)
+    if task.cancelled():
+        _stats["cancelled"] += 1
+    elif task.exception() is not None:
+        _stats["failed"] += 1
+        logger.debug("Prefetch failed for chunk %s: %s", key[0], task.exception())
+    else:
+        _stats["completed"] += 1
+        _prefetched[key] = True
+        _prefetched.move_to_end(key)
+        while len(_prefetched) > PREFETCH_TRACKED_PAGES:
+            _prefetched.popitem(last=False)
+    _pump()
+
+def shutdown():
+    """Drops queued prefetches and cancels those in flight. Called from the application lifespan."""
+    _pending.clear()
+    for task in list(_in_flight):
+        task.cancel()
+
+def get_prefetch_stats() -> dict:
+    """Prefetch counts and hit rate: the share of completed prefetches a later request used."""
+    completed = _stats["completed"]
+    return {
+        "enabled": PREFETCH_ENABLED,
+        **_stats,
+        "hit_rate": _stats["hits"] / completed if completed else 0.0,
+        "queued": len(_pending),
+        "in_flight": len(_in_flight),
+    }
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import random
+from collections import deque
+import aiohttp
+
+from app.services import inaturalist_service, metrics, prefetch
+
+logger = logging.getLogger(__name__)
+
+# Hedged probing: this many presence checks are kept in flight at once, up to
+# ROLL_MAX_PROBES per roll
+ROLL_PROBE_CONCURRENCY = int(os.getenv("ROLL_PROBE_CONCURRENCY", "4"))
+ROLL_MAX_PROBES = int(os.getenv("ROLL_MAX_PROBES", "16"))
+# Candidates drawn from the chunk set per roll; only these are checked against
+# the caches, so a roll costs the same for a 100 or a 20,000 chunk search
+ROLL_CANDIDATE_SAMPLE = int(os.getenv("ROLL_CANDIDATE_SAMPLE", "128"))
+
+async def _observations_if_any(session: aiohttp.ClientSession, chunk: tuple, taxa_ids: list[int] | None) -> dict | None:
+    """The chunk's first observation page, or None if it has nothing to show."""
+    # Before the fetch, so a prefetched page only counts as a hit if it is still cached
+    prefetch.record_request(chunk, taxa_ids)
+    page = await inaturalist_service.get_observations_page(session, chunk, taxa_ids)
+    return page if page["observations"] else None
+
+async def roll_chunk(session: aiohttp.ClientSession, chunks: list, taxa_ids: list[int] | None) -> dict:
+    """Picks a random chunk that has observations and returns it with its first page.
+
+    Up to ROLL_CANDIDATE_SAMPLE random candidates are drawn from chunks.
+    Those the caches already know to have observations are preferred. Failing
+    that, the rest are probed ROLL_PROBE_CONCURRENCY at a time; the first hit
+    wins and the probes still in flight are cancelled. Page fetches for
+    cached positives and probes share the ROLL_MAX_PROBES cap. Returns
+    {"chunk", "observations", "nextCursor", "found", "probes"}; if nothing is
+    found, found is False and chunk is the last candidate tried.
+    """
+    candidates = random.sample(chunks, min(len(chunks), ROLL_CANDIDATE_SAMPLE))
+
+    # Cached positives first; cached negatives are never probed
+    unknown = []
+    probes = 0
+    last_chunk = None
+    for chunk in candidates:
+        presence = inaturalist_service.cached_presence(chunk, taxa_ids)
+        if presence:
+            if probes >= ROLL_MAX_PROBES:
+                continue
+            probes += 1
+            last_chunk = chunk
+            page = await _observations_if_any(session, chunk, taxa_ids)
+            if page is not None:
+                return {"chunk": chunk, **page, "found": True, "probes": probes}
+        elif presence is None:
+            unknown.append(chunk)
+
+    with metrics.span("roll_probing"):
+        return await _probe(session, unknown, taxa_ids, probes, last_chunk)
+
+async def _probe(session: aiohttp.ClientSession, candidates: list, taxa_ids: list[int] | None,
+                 probes: int = 0, last_chunk: tuple | None = None) -> dict:
+    pending = deque(candidates)
+    in_flight = {}  # task -> chunk
+
+    def fill():
+        nonlocal probes, last_chunk
+        while pending and len(in_flight) < ROLL_PROBE_CONCURRENCY and probes < ROLL_MAX_PROBES:
+            chunk = pending.popleft()
+            probes += 1
+            last_chunk = chunk
+            task = asyncio.ensure_future(inaturalist_service.check_observations_in_chunk(session, chunk, taxa_ids))
+            in_flight[task] = chunk
+
+    def cancel_in_flight():
+        # Losing probes are cancelled (their upstream calls go with them) and
+        # go back in the queue in case the winner turns out to have no photos
+        nonlocal probes
+        for task, chunk in in_flight.items():
+            if task.cancel():
+                pending.appendleft(chunk)
+                probes -= 1
+        in_flight.clear()
+
+    fill()
+    try:
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            hits = []
+            for task in done:
+                chunk = in_flight.pop(task)
+                try:
+                    if task.result():
+                        hits.append(chunk)
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 429:
+                        raise
+                    logger.warning("Roll probe failed for chunk %s: %s", chunk[:2], e)
+
+            if hits:
+                cancel_in_flight()
+                for chunk in hits:
+                    page = await _observations_if_any(session, chunk, taxa_ids)
+                    if page is not None:
+                        logger.debug("Roll found chunk %s after %d probes", chunk[:2], probes)
+                        return {"chunk": chunk, **page, "found": True, "probes": probes}
+            fill()
+    finally:
+        cancel_in_flight()
+
+    return {"chunk": last_chunk, "observations": [], "nextCursor": None, "found": False, "probes": probes}
@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import aiohttp
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Outbound request layer shared by the services: a token bucket per upstream
+# host, single-flight coalescing of identical GETs, and jittered backoff.
+
+INATURALIST_RATE_PER_SECOND = float(os.getenv("INATURALIST_RATE_PER_SECOND", "1.5"))
+INATURALIST_BURST = float(os.getenv("INATURALIST_BURST", "10"))
+MAPBOX_RATE_PER_SECOND = float(os.getenv("MAPBOX_RATE_PER_SECOND", "5"))
+MAPBOX_BURST = float(os.getenv("MAPBOX_BURST", "10"))
+
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", "0.5"))
+UPSTREAM_BACKOFF_MAX_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", "10"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Token bucket rate limiter for one upstream host.
+
+    Each acquire reserves a token immediately (the balance may go negative) and
+    then sleeps until that token would have been refilled, so waiters are
+    served in arrival order without a lock.
+
+    Background calls (see mark_background) yield to foreground ones: a
+    foreground acquire that would have to wait first takes back the tokens
+    of background calls still sleeping on a reservation, so it never queues
+    behind them. Those calls reserve again once their sleep ends.
+    """
+
+    def __init__(self, host: str, rate_per_second: float, burst: float):
+        self.host = host
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.acquired = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.preempted = 0
+        self._background_waiters = []  # [call, preempted] of sleeping background reservations
+
+    async def acquire(self, call: "_UpstreamCall | None" = None):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            background = call is not None and call.background
+            if not background and self.tokens < 1:
+                self._preempt_background()
+            self.tokens -= 1
+            self.acquired += 1
+            if self.tokens >= 0:
+                return
+
+            wait = -self.tokens / self.rate
+            waiter = [call, False]
+            if background:
+                self._background_waiters.append(waiter)
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Give the reserved token back so a cancelled waiter doesn't use up budget
+                if not waiter[1]:
+                    self.tokens += 1
+                    self.acquired -= 1
+                raise
+            finally:
+                self.queue_depth -= 1
+                if background and not waiter[1]:
+                    self._background_waiters.remove(waiter)
+            if not waiter[1]:
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+                return
+            # The reservation went to a foreground request; queue again
+
+    def _preempt_background(self):
+        """Hands the tokens of sleeping background reservations back to the bucket."""
+        kept = []
+        for waiter in self._background_waiters:
+            if waiter[0].background:
+                waiter[1] = True
+                self.tokens += 1
+                self.acquired -= 1
+                self.preempted += 1
+            else:
+                # A foreground caller has since joined the call
+                kept.append(waiter)
+        self._background_waiters = kept
+
+    def available(self) -> float:
+        """Tokens that could be taken right now without waiting."""
+        return min(self.burst, self.tokens + (time.monotonic() - self.updated_at) * self.rate)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "avg_wait_seconds": self.total_wait_seconds / self.acquired if self.acquired else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+            "preempted": self.preempted,
+        }
+
+_buckets = {
+    "api.inaturalist.org": TokenBucket("api.inaturalist.org", INATURALIST_RATE_PER_SECOND, INATURALIST_BURST),
+    "api.mapbox.com": TokenBucket("api.mapbox.com", MAPBOX_RATE_PER_SECOND, MAPBOX_BURST),
+}
+_inflight = {}  # request key -> [asyncio.Task, number of callers awaiting it, _UpstreamCall]
+_background = contextvars.ContextVar("upstream_background", default=False)
+
+class _UpstreamCall:
+    """Priority of one single-flight call: background until a foreground caller joins it."""
+
+    def __init__(self, background: bool):
+        self.background = background
+
+def _get_bucket(host: str) -> TokenBucket:
+    # host is the URL's netloc, so local servers on different ports get separate buckets
+    if host not in _buckets:
+        # Unknown hosts get the more conservative iNaturalist budget
+        _buckets[host] = TokenBucket(host, INATURALIST_RATE_PER_SECOND, INATURALIST_BURST)
+    return _buckets[host]
+
+def has_spare_capacity(url: str) -> bool:
+    """True if a request to url's host would go out now, with nobody queued on its rate limiter."""
+    bucket = _get_bucket(urlparse(url).netloc)
+    return bucket.queue_depth == 0 and bucket.available() >= 1
+
+def mark_background():
+    """Makes the current task's upstream calls background work, which yields the rate limiter to other calls."""
+    _background.set(True)
+
+def get_upstream_stats() -> dict:
+    """Rate limiter, retry and coalescing metrics per upstream host."""
+    return {host: bucket.stats() for host, bucket in _buckets.items()}
+
+def _retry_after_seconds(response: aiohttp.ClientResponse) -> float | None:
+    """Parses a Retry-After header given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX_SECONDS, UPSTREAM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+async def _fetch_json(session: aiohttp.ClientSession, url: str, params: dict | None, bucket: TokenBucket,
+                      call: _UpstreamCall):
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        await bucket.acquire(call)
+        bucket.requests += 1
+        async with session.get(url, params=params, ssl=False) as response:
+            if response.status not in RETRY_STATUSES or attempt == UPSTREAM_MAX_RETRIES:
+                response.raise_for_status()
+                # orjson straight from the raw bytes; like response.json(), an empty body is None
+                body = await response.read()
+                return orjson.loads(body) if body.strip() else None
+
+            if response.status == 429:
+                bucket.throttled += 1
+            retry_after = _retry_after_seconds(response)
+
+        delay = _backoff_seconds(attempt)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, UPSTREAM_BACKOFF_MAX_SECONDS))
+        bucket.retries += 1
+        logger.warning("Upstream %s returned %s, retrying in %.2fs (attempt %d)", bucket.host, response.status, delay, attempt + 1)
+        await asyncio.sleep(delay)
+
+async def get_json(session: aiohttp.ClientSession, url: str, params: dict | None = None):
+    """GETs a JSON document from an upstream API through the shared outbound layer.
+
+    Concurrent identical requests share one in-flight call, which is cancelled
+    (freeing its rate limiter slot) once every caller awaiting it has been
+    cancelled. Failed requests raise aiohttp.ClientResponseError, as
+    response.raise_for_status() would.
+    """
+    bucket = _get_bucket(urlparse(url).netloc)
+    key = (url, json.dumps(params, sort_keys=True, default=str))
+
+    entry = _inflight.get(key)
+    if entry is not None:
+        bucket.coalesced += 1
+        if not _background.get():
+            entry[2].background = False
+    else:
+        call = _UpstreamCall(_background.get())
+        task = asyncio.ensure_future(_fetch_json(session, url, params, bucket, call))
+        entry = _inflight[key] = [task, 0, call]
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    task = entry[0]
+    entry[1] += 1
+    try:
+        # Shield so one caller being cancelled doesn't cancel the shared call
+        return await asyncio.shield(task)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not task.done():
+            task.cancel()
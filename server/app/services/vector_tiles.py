@@ -0,0 +1,153 @@
+import hashlib
+import math
+import os
+import numpy as np
+import orjson
+
+from app.services import geo_service
+from app.services.cache import TTLCache
+
+# Chunk grids of recent searches, held by search ID for the /tiles route. Least
+# recently used grids are evicted first; an evicted search has to be re-run.
+TILE_GRID_CACHE_MAX_ENTRIES = int(os.getenv("TILE_GRID_CACHE_MAX_ENTRIES", "64"))
+TILE_GRID_CACHE_MAX_BYTES = int(os.getenv("TILE_GRID_CACHE_MAX_MB", "32")) * 1024 * 1024
+TILE_GRID_CACHE_TTL = float(os.getenv("TILE_GRID_CACHE_TTL_SECONDS", str(2 * 60 * 60)))
+
+# Mapbox Vector Tile v2: one "chunks" layer of polygons in a 4096-unit tile,
+# clipped to a small buffer around it so outlines don't show tile seams
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+LAYER_NAME = "chunks"
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 24
+
+def _encode_grid(grid: dict) -> bytes:
+    return orjson.dumps(grid, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def _decode_grid(data: bytes) -> dict:
+    grid = orjson.loads(data)
+    grid["ids"] = np.asarray(grid["ids"], dtype=np.int64)
+    if grid["counts"] is not None:
+        grid["counts"] = np.asarray(grid["counts"], dtype=np.int64)
+    return grid
+
+_grid_cache = TTLCache(
+    "tile_grids", TILE_GRID_CACHE_MAX_ENTRIES, TILE_GRID_CACHE_TTL, TILE_GRID_CACHE_MAX_BYTES,
+    persistent=True, encode=_encode_grid, decode=_decode_grid,
+)
+
+def store_grid(lattice: geo_service.ChunkLattice, chunk_ids: list[int], counts: list[int] | None = None) -> str:
+    """Holds a search's chunks (and optional per-chunk counts) for tiling and returns its search ID.
+
+    The ID is a hash of the grid, so repeating a search gives the same tile URLs.
+    """
+    ids = np.asarray(chunk_ids, dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    digest = hashlib.blake2b(orjson.dumps([lattice.chunk_size_km, lattice.band]), digest_size=16)
+    digest.update(ids.tobytes())
+    if counts is not None:
+        counts = np.asarray(counts, dtype=np.int64)[order]
+        digest.update(counts.tobytes())
+    search_id = digest.hexdigest()
+
+    if _grid_cache.peek(search_id) is None:
+        _grid_cache.set(search_id, {"chunkSize": lattice.chunk_size_km, "band": lattice.band, "ids": ids, "counts": counts})
+    return search_id
+
+async def get_grid(search_id: str) -> dict | None:
+    return await _grid_cache.aget(search_id)
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+def _tile_x(lons: np.ndarray, z: int, x: int) -> np.ndarray:
+    """Web Mercator tile-local x in tile units."""
+    return ((lons + 180) / 360 * 2 ** z - x) * TILE_EXTENT
+
+def _tile_y(lats: np.ndarray, z: int, y: int) -> np.ndarray:
+    """Web Mercator tile-local y in tile units, growing southwards."""
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    mercator_y = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / math.pi) / 2
+    return (mercator_y * 2 ** z - y) * TILE_EXTENT
+
+def tile_rectangles(grid: dict, z: int, x: int, y: int) -> tuple:
+    """Chunk IDs, counts (or None) and clipped integer rectangles (x0, y0, x1, y1) for one tile.
+
+    Chunks smaller than a tile unit are kept at one unit, and chunks that
+    collapse onto the same rectangle at low zooms are drawn once.
+    """
+    lattice = geo_service.get_lattice(grid["chunkSize"], grid["band"])
+    ids = grid["ids"]
+    rows, cols = np.divmod(ids, lattice.cols)
+    x0 = _tile_x(lattice.min_lons(cols), z, x)
+    x1 = _tile_x(lattice.min_lons(cols + 1), z, x)
+    y0 = _tile_y(lattice.min_lats(rows + 1), z, y)
+    y1 = _tile_y(lattice.min_lats(rows), z, y)
+
+    low, high = -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER
+    keep = (x1 > low) & (x0 < high) & (y1 > low) & (y0 < high)
+    rectangles = np.column_stack([np.clip(np.rint(edge[keep]), low, high) for edge in (x0, y0, x1, y1)]).astype(np.int64)
+    rectangles[:, 2] = np.maximum(rectangles[:, 2], rectangles[:, 0] + 1)
+    rectangles[:, 3] = np.maximum(rectangles[:, 3], rectangles[:, 1] + 1)
+
+    _, first = np.unique(rectangles, axis=0, return_index=True)
+    first.sort()
+    counts = grid["counts"]
+    return ids[keep][first], None if counts is None else counts[keep][first], rectangles[first]
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+def _field_bytes(field: int, data: bytes) -> bytes:
+    return _varint(field << 3 | 2) + _varint(len(data)) + data
+
+def _packed(field: int, values) -> bytes:
+    return _field_bytes(field, b"".join(_varint(value) for value in values))
+
+def encode_tile(grid: dict, z: int, x: int, y: int) -> bytes:
+    """Encodes one tile of a stored grid as a Mapbox Vector Tile.
+
+    Each chunk is a square polygon whose feature ID is its chunk ID, with a
+    "count" property if the search had counts. Tiles with no chunks are empty.
+    """
+    ids, counts, rectangles = tile_rectangles(grid, z, x, y)
+    if ids.size == 0:
+        return b""
+
+    values = {}  # count -> index into the layer's values
+    features = []
+    for i, (left, top, right, bottom) in enumerate(rectangles.tolist()):
+        # Exterior ring clockwise in tile coordinates: MoveTo, 3 x LineTo, ClosePath
+        geometry = (
+            9, _zigzag(left), _zigzag(top),
+            26, _zigzag(right - left), 0, 0, _zigzag(bottom - top), _zigzag(left - right), 0,
+            15,
+        )
+        feature = _field_varint(1, int(ids[i]))
+        if counts is not None:
+            count = int(counts[i])
+            feature += _packed(2, (0, values.setdefault(count, len(values))))
+        feature += _field_varint(3, 3) + _packed(4, geometry)  # type 3: POLYGON
+        features.append(_field_bytes(2, feature))
+
+    layer = b"".join((
+        _field_varint(15, 2),
+        _field_bytes(1, LAYER_NAME.encode()),
+        *features,
+        _field_bytes(3, b"count") if counts is not None else b"",
+        *(_field_bytes(4, _field_varint(5, count)) for count in values),  # uint_value
+        _field_varint(5, TILE_EXTENT),
+    ))
+    return _field_bytes(3, layer)
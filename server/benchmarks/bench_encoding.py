@@ -0,0 +1,41 @@
+"""
+Benchmark for /find-chunks response encodings.
+
+Compares payload size and serialization time of the default JSON chunk list
+against the compact bitset grid, and checks the compact grid decodes back to
+the same chunks.
+
+Run from the server directory:
+    python -m benchmarks.bench_encoding
+"""
+import json
+import time
+
+from app.services import geo_service
+from benchmarks.bench_grid import CHUNK_SIZES, DRIVETIMES, synthetic_isochrone
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    print(f"{'drivetime':>9} {'chunkSize':>9} {'chunks':>8} {'json KB':>9} {'compact KB':>10} {'json ms':>8} {'compact ms':>10}")
+    for minutes in DRIVETIMES:
+        for chunk_size in CHUNK_SIZES:
+            isochrone = synthetic_isochrone(minutes)
+            json_time, json_body = timed(
+                lambda: json.dumps({"chunks": geo_service.generate_chunks_in_isochrone(isochrone, chunk_size)})
+            )
+            compact_time, compact_body = timed(
+                lambda: json.dumps({"grid": geo_service.encode_compact_grid(isochrone, chunk_size)})
+            )
+            chunks = json.loads(json_body)["chunks"]
+            decoded = geo_service.decode_compact_grid(json.loads(compact_body)["grid"])
+            if [list(chunk) for chunk in decoded] != chunks:
+                raise AssertionError(f"Decoded grid mismatch for drivetime={minutes}, chunkSize={chunk_size}")
+            print(f"{minutes:>9} {chunk_size:>9} {len(chunks):>8} {len(json_body) / 1024:>9.1f} "
+                  f"{len(compact_body) / 1024:>10.2f} {json_time * 1000:>8.1f} {compact_time * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark for chunk grid generation.
+
+Compares a per-cell Point/contains reference loop against the vectorized
+engine in geo_service across drivetime/chunkSize combinations, and checks
+that both return exactly the same chunks.
+
+Run from the server directory:
+    python -m benchmarks.bench_grid
+"""
+import math
+import time
+
+from shapely.geometry import Point, Polygon
+
+from app.services import geo_service
+
+ORIGIN = (144.9631, -37.8136)  # Melbourne CBD (lon, lat)
+DRIVETIMES = [15, 30, 45, 60]
+CHUNK_SIZES = [0.5, 1.0, 2.0, 5.0]
+AVERAGE_SPEED_KMH = 55.0
+
+def synthetic_isochrone(minutes: int, vertices: int = 240) -> Polygon:
+    """Builds an irregular, isochrone-like polygon around ORIGIN for the given drivetime."""
+    radius_km = minutes / 60 * AVERAGE_SPEED_KMH
+    lon0, lat0 = ORIGIN
+    coords = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        # Lobes along road corridors, like a real drivetime polygon
+        r = radius_km * (0.65 + 0.25 * math.sin(5 * angle) + 0.1 * math.cos(13 * angle))
+        dlat = r * math.sin(angle) / 111.0
+        dlon = r * math.cos(angle) / (111.0 * math.cos(math.radians(lat0)))
+        coords.append((lon0 + dlon, lat0 + dlat))
+    return Polygon(coords)
+
+def pointwise_generate_chunks(isochrone: Polygon, chunk_size_km: float):
+    """Reference grid: one Point and contains() call per global lattice cell.
+
+    Uses the per-cell algorithm of the original engine (nested while loops),
+    but on the lattice cells the vectorized engine uses, so the two must
+    return exactly the same chunks. It is not the original code, which
+    stepped from the bounding box corner rather than from the lattice.
+    """
+    valid_chunks = []
+    min_lon, min_lat, max_lon, max_lat = isochrone.bounds
+    lattice = geo_service.lattice_for(chunk_size_km, (min_lat + max_lat) / 2)
+
+    row = math.floor((min_lat + 90) / lattice.step_lat)
+    while lattice.min_lats(row) <= max_lat:
+        current_lat, next_lat = lattice.min_lats(row), lattice.min_lats(row + 1)
+        col = math.floor((min_lon + 180) / lattice.step_lon)
+        while lattice.min_lons(col) <= max_lon:
+            current_lon, next_lon = lattice.min_lons(col), lattice.min_lons(col + 1)
+            center_lat = current_lat + lattice.step_lat / 2
+            center_lon = current_lon + lattice.step_lon / 2
+            if isochrone.contains(Point(center_lon, center_lat)):
+                valid_chunks.append((current_lon, current_lat, next_lon, next_lat))
+            col += 1
+        row += 1
+    return valid_chunks
+
+def best_of(func, *args, repeat: int = 3) -> tuple:
+    """Returns (best wall time in seconds, last result)."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    print(f"{'drivetime':>9} {'chunkSize':>9} {'cells':>8} {'chunks':>8} {'pointwise ms':>12} {'vector ms':>10} {'speedup':>8}")
+    for minutes in DRIVETIMES:
+        for chunk_size in CHUNK_SIZES:
+            # Fresh polygons so the vectorized run can't reuse a prepared geometry
+            pointwise_time, expected = best_of(pointwise_generate_chunks, synthetic_isochrone(minutes), chunk_size, repeat=1)
+            vector_time, actual = best_of(geo_service.generate_chunks_in_isochrone, synthetic_isochrone(minutes), chunk_size)
+            if actual != expected:
+                raise AssertionError(f"Chunk mismatch for drivetime={minutes}, chunkSize={chunk_size}")
+            cells = geo_service.estimate_grid_cells(synthetic_isochrone(minutes), chunk_size)
+            print(f"{minutes:>9} {chunk_size:>9} {cells:>8} {len(actual):>8} "
+                  f"{pointwise_time * 1000:>12.1f} {vector_time * 1000:>10.1f} {pointwise_time / vector_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
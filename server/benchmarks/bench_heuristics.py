@@ -0,0 +1,61 @@
+"""
+Micro-benchmarks for the park heuristics.
+
+Times the per-chunk helpers (is_in_major_park, chunk_overlaps_major_park,
+is_likely_green_space, is_likely_parkland, check_parkland_percentage_heuristic)
+called once per chunk against the batched classify_chunks pass, over the
+chunk grids of the synthetic isochrones. The grid generation itself is
+covered by benchmarks.bench_grid.
+
+Run from the server directory:
+    python -m benchmarks.bench_heuristics
+"""
+import asyncio
+import time
+
+from app.services import geo_service
+from benchmarks.bench_grid import CHUNK_SIZES, DRIVETIMES, best_of, synthetic_isochrone
+
+SAMPLE_CHUNKS = 2000  # per-chunk helpers are timed on at most this many chunks
+
+def _centers(chunks: list) -> list[tuple]:
+    return [((c[0] + c[2]) / 2, (c[1] + c[3]) / 2) for c in chunks]
+
+def per_chunk_loops(chunks: list) -> dict:
+    """Per-call time in microseconds of each scalar helper over chunks."""
+    centers = _centers(chunks)
+    timings = {}
+    for name, func, args in (
+        ("in_major_park", geo_service.is_in_major_park, centers),
+        ("overlaps_major_park", geo_service.chunk_overlaps_major_park, [(c,) for c in chunks]),
+        ("likely_green_space", geo_service.is_likely_green_space, centers),
+        ("likely_parkland", geo_service.is_likely_parkland, centers),
+    ):
+        start = time.perf_counter()
+        for call_args in args:
+            func(*call_args)
+        timings[name] = (time.perf_counter() - start) / len(args) * 1e6
+
+    async def heuristic():
+        for chunk in chunks:
+            await geo_service.check_parkland_percentage_heuristic(None, chunk)
+    start = time.perf_counter()
+    asyncio.run(heuristic())
+    timings["parkland_heuristic"] = (time.perf_counter() - start) / len(chunks) * 1e6
+    return timings
+
+def main():
+    names = ["in_major_park", "overlaps_major_park", "likely_green_space", "likely_parkland", "parkland_heuristic"]
+    print("Per-chunk helpers in us/call; classify_chunks as total ms and us/chunk")
+    print(f"{'drivetime':>9} {'chunkSize':>9} {'chunks':>8} " + " ".join(f"{name:>19}" for name in names)
+          + f" {'classify ms':>11} {'us/chunk':>8}")
+    for minutes in DRIVETIMES:
+        for chunk_size in CHUNK_SIZES:
+            chunks = geo_service.generate_chunks_in_isochrone(synthetic_isochrone(minutes), chunk_size)
+            loops = per_chunk_loops(chunks[:: max(1, len(chunks) // SAMPLE_CHUNKS)])
+            batch_time, _ = best_of(geo_service.classify_chunks, chunks)
+            print(f"{minutes:>9} {chunk_size:>9} {len(chunks):>8} " + " ".join(f"{loops[name]:>19.1f}" for name in names)
+                  + f" {batch_time * 1000:>11.1f} {batch_time / len(chunks) * 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark for the land-cover raster backend.
+
+Checks the summed-area-table lookups against direct pixel counts on the
+synthetic tile set in benchmarks/data/landcover, then times batch queries
+over a full chunk grid.
+
+Run from the server directory:
+    python -m benchmarks.bench_landcover
+"""
+import os
+import time
+
+import numpy as np
+
+from app.services import geo_service
+from app.services.landcover import LandCoverTileSet
+from benchmarks.bench_grid import CHUNK_SIZES, DRIVETIMES, synthetic_isochrone
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "landcover")
+
+def naive_green_percentage(tileset: LandCoverTileSet, chunk: tuple, green_classes=(1, 2)) -> float:
+    """Counts green pixels by slicing each overlapping tile directly."""
+    green = total = 0
+    for tile in tileset.tiles:
+        green_tile, total_tile = tile.window_sums(np.array([chunk]))
+        if total_tile[0] == 0:
+            continue
+        col0 = int(np.clip(np.floor((chunk[0] - tile.min_lon) / tile.pixel_width), 0, tile.cols))
+        col1 = int(np.clip(np.ceil((chunk[2] - tile.min_lon) / tile.pixel_width), 0, tile.cols))
+        row0 = int(np.clip(np.floor((tile.max_lat - chunk[3]) / tile.pixel_height), 0, tile.rows))
+        row1 = int(np.clip(np.ceil((tile.max_lat - chunk[1]) / tile.pixel_height), 0, tile.rows))
+        window = tile.raster[row0:row1, col0:col1]
+        green += int(np.isin(window, green_classes).sum())
+        total += window.size
+    return green * 100.0 / total if total else float("nan")
+
+def main():
+    tileset = LandCoverTileSet(DATA_DIR)
+    print(f"{'drivetime':>9} {'chunkSize':>9} {'chunks':>8} {'batch ms':>9} {'naive ms':>9}")
+    for minutes in DRIVETIMES:
+        for chunk_size in CHUNK_SIZES:
+            chunks = geo_service.generate_chunks_in_isochrone(synthetic_isochrone(minutes), chunk_size)
+
+            start = time.perf_counter()
+            batch = tileset.green_percentage(chunks)
+            batch_time = time.perf_counter() - start
+
+            sample = chunks[:: max(1, len(chunks) // 500)]
+            start = time.perf_counter()
+            naive = np.array([naive_green_percentage(tileset, chunk) for chunk in sample])
+            naive_time = (time.perf_counter() - start) * len(chunks) / len(sample)
+
+            expected = tileset.green_percentage(sample)
+            if not np.allclose(expected, naive, equal_nan=True):
+                raise AssertionError(f"Land-cover mismatch for drivetime={minutes}, chunkSize={chunk_size}")
+            print(f"{minutes:>9} {chunk_size:>9} {len(chunks):>8} {batch_time * 1000:>9.2f} {naive_time * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Load benchmark for the API against local stand-in upstreams.
+
+Starts the Mapbox and iNaturalist stand-ins (benchmarks.standins), runs the
+app under uvicorn in the same process pointed at them, then drives each
+endpoint with a fixed number of requests at a fixed concurrency and reports
+throughput and p50/p95/p99 latency per endpoint.
+
+Requests draw from a pool of origins and a pool of chunks, so the pool sizes
+control how often the server-side caches hit. The app's own upstream rate
+limits are raised by default so the numbers measure the server rather than
+the limiter; pass --upstream-rate to benchmark with production limits.
+
+Run from the server directory:
+    python -m benchmarks.bench_load --requests 200 --concurrency 16 --latency-ms 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import numpy as np
+
+# Nothing from app (or modules importing it) at module level: app settings are
+# read from the environment at import time, which run() sets up first
+from benchmarks.standins import StandInConfig, add_standin_arguments, standin_stats, start_standins, stop_standins
+
+ENDPOINTS = ["find-chunks", "find-chunks/batch", "observations", "chunk-observations", "roll"]
+
+def make_requests(endpoint: str, args, origins: list, chunks: list) -> list[tuple]:
+    """(method, path, params, json body) for every request of one endpoint."""
+    rng = np.random.default_rng(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        if endpoint in ("find-chunks", "roll"):
+            lon, lat = origins[rng.integers(len(origins))]
+            body = {"lat": lat, "lon": lon, "drivetime": args.drivetime, "chunkSize": args.chunk_size}
+            if args.taxa:
+                body["taxaFilter"] = args.taxa
+            requests.append(("POST", f"/api/{endpoint}", None, body))
+            continue
+        if endpoint == "find-chunks/batch":
+            picks = rng.choice(len(origins), size=min(3, len(origins)), replace=False)
+            body = {
+                "origins": [{"lat": origins[i][1], "lon": origins[i][0], "drivetime": args.drivetime} for i in picks],
+                "combine": "union",
+                "chunkSize": args.chunk_size,
+            }
+            if args.taxa:
+                body["taxaFilter"] = args.taxa
+            requests.append(("POST", "/api/find-chunks/batch", None, body))
+            continue
+
+        min_lon, min_lat, max_lon, max_lat = chunks[rng.integers(len(chunks))]
+        if endpoint == "observations":
+            params = {"nelat": max_lat, "nelng": max_lon, "swlat": min_lat, "swlng": min_lon}
+            if args.taxa:
+                params["taxaFilter"] = args.taxa
+            requests.append(("GET", "/api/observations", params, None))
+        else:
+            body = {"chunkBounds": [min_lon, min_lat, max_lon, max_lat], "taxaFilter": args.taxa}
+            requests.append(("POST", "/api/chunk-observations", None, body))
+    return requests
+
+async def run_endpoint(session: aiohttp.ClientSession, base_url: str, requests: list[tuple], concurrency: int) -> dict:
+    queue = list(reversed(requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, path, params, body = queue.pop()
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, params=params, json=body) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": max(latencies) * 1000,
+    }
+
+async def start_app():
+    """Serves the app with uvicorn on a free port."""
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://127.0.0.1:{port}"
+
+async def run(args) -> dict:
+    config = StandInConfig(args.latency_ms, args.jitter_ms, args.throttle_rps, args.throttle_burst)
+    standins = await start_standins(config)
+    os.environ["MAPBOX_API_URL"] = standins["mapbox"]["url"]
+    os.environ["INATURALIST_API_URL"] = standins["inaturalist"]["url"]
+    if args.upstream_rate is None:
+        for name in ("INATURALIST_RATE_PER_SECOND", "MAPBOX_RATE_PER_SECOND", "INATURALIST_BURST", "MAPBOX_BURST"):
+            os.environ[name] = "100000"
+    else:
+        os.environ["INATURALIST_RATE_PER_SECOND"] = os.environ["MAPBOX_RATE_PER_SECOND"] = str(args.upstream_rate)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app.services import geo_service
+    from benchmarks.bench_grid import ORIGIN, synthetic_isochrone
+
+    rng = np.random.default_rng(args.seed)
+    origins = (np.array(ORIGIN) + rng.normal(scale=0.05, size=(args.origins, 2))).tolist()
+    grid = geo_service.generate_chunks_in_isochrone(synthetic_isochrone(args.drivetime), args.chunk_size)
+    chunks = [grid[i] for i in rng.choice(len(grid), min(args.chunks, len(grid)), replace=False)]
+
+    server, server_task, base_url = await start_app()
+    results = {}
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for endpoint in args.endpoints:
+                requests = make_requests(endpoint, args, origins, chunks)
+                results[endpoint] = await run_endpoint(session, base_url, requests, args.concurrency)
+    finally:
+        server.should_exit = True
+        await server_task
+        upstream = standin_stats(standins)
+        await stop_standins(standins)
+    return {"endpoints": results, "upstream": upstream}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_standin_arguments(parser)
+    parser.add_argument("--endpoints", type=lambda value: value.split(","), default=ENDPOINTS,
+                        help=f"Comma-separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--origins", type=int, default=20, help="Distinct search origins for find-chunks")
+    parser.add_argument("--chunks", type=int, default=200, help="Distinct chunks for the observation endpoints")
+    parser.add_argument("--drivetime", type=int, default=30)
+    parser.add_argument("--chunk-size", type=float, default=1.0)
+    parser.add_argument("--taxa", default=None, help="taxaFilter sent with every request")
+    parser.add_argument("--upstream-rate", type=float, default=None,
+                        help="App-side upstream rate limit per second (default: effectively unlimited)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+    for endpoint in args.endpoints:
+        if endpoint not in ENDPOINTS:
+            parser.error(f"unknown endpoint '{endpoint}'")
+
+    report = asyncio.run(run(args))
+
+    print(f"{'endpoint':<20} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<20} {r['requests']:>8} {r['errors']:>6} {r['throughput']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    for name, counters in report["upstream"].items():
+        print(f"upstream {name}: {counters['requests']} requests, {counters['throttled']} throttled")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"arguments": vars(args), **report}, f, indent=2)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
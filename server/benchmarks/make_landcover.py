@@ -0,0 +1,54 @@
+"""
+Writes the small synthetic land-cover tile set in benchmarks/data/landcover.
+
+Two 256x256 tiles over Melbourne: class 1 (park) inside the bundled park and
+green-space areas, class 2 (scrub) in a fixed random scatter, class 0 (urban)
+elsewhere. Classes 1 and 2 count as green cover.
+
+Run from the server directory:
+    python -m benchmarks.make_landcover
+"""
+import json
+import os
+
+import numpy as np
+
+from app.services import park_index
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "data", "landcover")
+TILE_SHAPE = (256, 256)
+TILE_BOUNDS = [
+    [144.80, -37.95, 145.00, -37.70],
+    [145.00, -37.95, 145.20, -37.70],
+]
+
+def make_tile(bounds: list, rng: np.random.Generator) -> np.ndarray:
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows, cols = TILE_SHAPE
+    # Pixel centers, row 0 at the northern edge
+    lons = min_lon + (np.arange(cols) + 0.5) * (max_lon - min_lon) / cols
+    lats = max_lat - (np.arange(rows) + 0.5) * (max_lat - min_lat) / rows
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+
+    raster = np.zeros(TILE_SHAPE, dtype=np.uint8)
+    raster[rng.random(TILE_SHAPE) < 0.1] = 2
+    for category in ("major_park", "green_space"):
+        inside = park_index.get_index(category).contains(lon_grid.ravel(), lat_grid.ravel())
+        raster[inside.reshape(TILE_SHAPE)] = 1
+    return raster
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    rng = np.random.default_rng(42)
+    tiles = []
+    for i, bounds in enumerate(TILE_BOUNDS):
+        name = f"melbourne_{i}.bin"
+        make_tile(bounds, rng).tofile(os.path.join(OUTPUT_DIR, name))
+        tiles.append({"file": name, "bounds": bounds, "shape": list(TILE_SHAPE), "dtype": "uint8"})
+    with open(os.path.join(OUTPUT_DIR, "index.json"), "w") as f:
+        json.dump({"green_classes": [1, 2], "tiles": tiles}, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {len(tiles)} tiles to {OUTPUT_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Writes the recorded upstream responses replayed by benchmarks.standins.
+
+  data/recorded/mapbox_isochrone.json      Mapbox isochrone responses per
+                                           drivetime, around ORIGIN
+  data/recorded/inaturalist_observations.json
+                                           a pool of observations around
+                                           Melbourne, clustered on the
+                                           bundled parks
+  data/recorded/inaturalist_taxa.json      /v1/taxa responses by search term
+
+The responses are synthetic but shaped like the real ones, so they can be
+swapped for real captures in the same layout.
+
+Run from the server directory:
+    python -m benchmarks.make_recordings
+"""
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services import park_index
+from benchmarks.bench_grid import DRIVETIMES, ORIGIN, synthetic_isochrone
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "data", "recorded")
+OBSERVATION_COUNT = 1500
+PARK_FRACTION = 0.6
+REGION = (144.5, -38.3, 145.4, -37.4)  # min_lon, min_lat, max_lon, max_lat
+
+# iconic taxon name -> (taxon id, a few species guesses)
+SPECIES = {
+    "Aves": (3, ["Australian Magpie", "Rainbow Lorikeet", "Noisy Miner", "Superb Fairywren"]),
+    "Plantae": (47126, ["River Red Gum", "Golden Wattle", "Common Tussock-grass"]),
+    "Insecta": (47158, ["Common Brown", "Blue-banded Bee", "Cabbage White"]),
+    "Mammalia": (40151, ["Common Brushtail Possum", "Grey-headed Flying-fox"]),
+    "Reptilia": (26036, ["Eastern Blue-tongued Skink", "Garden Skink"]),
+    "Amphibia": (20978, ["Common Eastern Froglet", "Southern Brown Tree Frog"]),
+    "Fungi": (47170, ["Fly Agaric", "Ghost Fungus"]),
+    "Arachnida": (47119, ["Garden Orb-weaver", "Huntsman Spider"]),
+}
+
+def mapbox_responses() -> dict:
+    responses = {}
+    for minutes in DRIVETIMES:
+        polygon = synthetic_isochrone(minutes)
+        responses[str(minutes)] = {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "properties": {"contour": minutes, "metric": "time"},
+                "geometry": {"type": "Polygon", "coordinates": [[list(xy) for xy in polygon.exterior.coords]]},
+            }],
+        }
+    return {"origin": list(ORIGIN), "responses": responses}
+
+def observation_locations(rng: np.random.Generator) -> tuple:
+    min_lon, min_lat, max_lon, max_lat = REGION
+    parks = np.vstack([
+        np.column_stack([index.center_lons, index.center_lats])
+        for index in (park_index.get_index("major_park"), park_index.get_index("green_space"))
+    ])
+    parks = parks[
+        (parks[:, 0] >= min_lon) & (parks[:, 0] <= max_lon) & (parks[:, 1] >= min_lat) & (parks[:, 1] <= max_lat)
+    ]
+    in_parks = int(OBSERVATION_COUNT * PARK_FRACTION)
+    centers = parks[rng.integers(len(parks), size=in_parks)]
+    clustered = centers + rng.normal(scale=0.008, size=centers.shape)
+    scattered = rng.uniform((min_lon, min_lat), (max_lon, max_lat), size=(OBSERVATION_COUNT - in_parks, 2))
+    return np.vstack([clustered, scattered])
+
+def observations(rng: np.random.Generator) -> list[dict]:
+    names = list(SPECIES)
+    ids = np.sort(rng.choice(np.arange(150_000_000, 250_000_000), OBSERVATION_COUNT, replace=False))
+    results = []
+    for obs_id, (lon, lat) in zip(ids.tolist(), observation_locations(rng).tolist()):
+        iconic_name = names[rng.integers(len(names))]
+        iconic_id, guesses = SPECIES[iconic_name]
+        species = guesses[rng.integers(len(guesses))]
+        observed_on = date(2024, 1, 1) + timedelta(days=int(rng.integers(600)))
+        results.append({
+            "id": obs_id,
+            "species_guess": species,
+            "observed_on": observed_on.isoformat(),
+            "location": f"{lat:.6f},{lon:.6f}",
+            "uri": f"https://www.inaturalist.org/observations/{obs_id}",
+            "photos": [{"url": f"https://inaturalist-open-data.s3.amazonaws.com/photos/{obs_id}/square.jpg"}],
+            "taxon": {"iconic_taxon_name": iconic_name, "ancestor_ids": [48460, iconic_id]},
+        })
+    return results
+
+def taxa_responses() -> dict:
+    # Iconic names are resolved from the bundled table, so only free-text
+    # searches ever reach /v1/taxa
+    return {
+        "responses": {
+            "eucalyptus": {"total_results": 1, "results": [{"id": 47194, "name": "Eucalyptus"}]},
+            "unknown": {"total_results": 0, "results": []},
+        }
+    }
+
+def _write(name: str, data: dict):
+    with open(os.path.join(OUTPUT_DIR, name), "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+        f.write("\n")
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    rng = np.random.default_rng(42)
+    _write("mapbox_isochrone.json", mapbox_responses())
+    _write("inaturalist_observations.json", {"results": observations(rng)})
+    _write("inaturalist_taxa.json", taxa_responses())
+    print(f"Wrote recorded responses to {OUTPUT_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Local stand-in servers for the Mapbox isochrone and iNaturalist APIs.
+
+They replay the recorded responses in benchmarks/data/recorded (see
+benchmarks.make_recordings) with configurable latency and throttling:
+
+  - Mapbox: the recorded isochrone closest to the requested drivetime,
+    translated to the requested origin.
+  - iNaturalist: the recorded observation pool filtered by bounding box and
+    taxon_id, ordered and paged by per_page / page / id_below / id_above like
+    the real API; taxa searches by exact (case-insensitive) term.
+
+Requests beyond the throttle rate get a 429 with a Retry-After header.
+
+Point the server at them with MAPBOX_API_URL and INATURALIST_API_URL. To run
+them standalone, from the server directory:
+    python -m benchmarks.standins --latency-ms 80 --throttle-rps 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from aiohttp import web
+
+RECORDED_DIR = os.path.join(os.path.dirname(__file__), "data", "recorded")
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    throttle_rps: float = 0.0  # 0 disables throttling
+    throttle_burst: float = 10.0
+
+class _Throttle:
+    """Token bucket that rejects, rather than queues, requests over the rate."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+def _load(name: str) -> dict:
+    with open(os.path.join(RECORDED_DIR, name)) as f:
+        return json.load(f)
+
+def _make_app(config: StandInConfig) -> web.Application:
+    throttle = _Throttle(config.throttle_rps, config.throttle_burst) if config.throttle_rps > 0 else None
+    counters = {"requests": 0, "throttled": 0}
+
+    @web.middleware
+    async def simulate_upstream(request: web.Request, handler):
+        counters["requests"] += 1
+        if throttle is not None and not throttle.allow():
+            counters["throttled"] += 1
+            return web.json_response({"error": "Too Many Requests"}, status=429, headers={"Retry-After": "1"})
+        delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return await handler(request)
+
+    app = web.Application(middlewares=[simulate_upstream])
+    app["counters"] = counters
+    return app
+
+def make_mapbox_app(config: StandInConfig) -> web.Application:
+    recorded = _load("mapbox_isochrone.json")
+    origin_lon, origin_lat = recorded["origin"]
+    contours = {int(minutes): body for minutes, body in recorded["responses"].items()}
+
+    async def isochrone(request: web.Request):
+        lon, lat = map(float, request.match_info["coordinates"].split(","))
+        minutes = int(request.query.get("contours_minutes", "30"))
+        body = contours[min(contours, key=lambda recorded_minutes: abs(recorded_minutes - minutes))]
+        dlon, dlat = lon - origin_lon, lat - origin_lat
+        features = []
+        for feature in body["features"]:
+            ring = [[x + dlon, y + dlat] for x, y in feature["geometry"]["coordinates"][0]]
+            features.append({**feature, "geometry": {"type": "Polygon", "coordinates": [ring]}})
+        return web.json_response({**body, "features": features})
+
+    app = _make_app(config)
+    app.router.add_get("/isochrone/v1/mapbox/{profile}/{coordinates}", isochrone)
+    return app
+
+def make_inaturalist_app(config: StandInConfig) -> web.Application:
+    results = _load("inaturalist_observations.json")["results"]
+    taxa = {term.lower(): body for term, body in _load("inaturalist_taxa.json")["responses"].items()}
+
+    ids = np.array([obs["id"] for obs in results])
+    lats, lons = np.array([list(map(float, obs["location"].split(","))) for obs in results]).T
+    observed_on = np.array([obs["observed_on"] for obs in results])
+    ancestors = [set(obs["taxon"]["ancestor_ids"]) for obs in results]
+
+    async def observations(request: web.Request):
+        query = request.query
+        mask = np.ones(len(results), dtype=bool)
+        if "swlng" in query:
+            mask &= (lons >= float(query["swlng"])) & (lons <= float(query["nelng"]))
+            mask &= (lats >= float(query["swlat"])) & (lats <= float(query["nelat"]))
+        if "taxon_id" in query:
+            wanted = {int(taxon_id) for taxon_id in query["taxon_id"].split(",")}
+            mask &= np.array([not wanted.isdisjoint(taxon_ids) for taxon_ids in ancestors])
+        if "id_below" in query:
+            mask &= ids < int(query["id_below"])
+        if "id_above" in query:
+            mask &= ids > int(query["id_above"])
+
+        matched = np.flatnonzero(mask)
+        keys = observed_on[matched] if query.get("order_by") == "observed_on" else ids[matched]
+        order = np.argsort(keys, kind="stable")
+        if query.get("order", "desc") == "desc":
+            order = order[::-1]
+        per_page = int(query.get("per_page", "30"))
+        offset = (int(query.get("page", "1")) - 1) * per_page
+        page = [results[i] for i in matched[order[offset:offset + per_page]]]
+        return web.json_response({"total_results": len(matched), "per_page": per_page, "results": page})
+
+    async def taxa_search(request: web.Request):
+        return web.json_response(taxa.get(request.query.get("q", "").lower(), {"total_results": 0, "results": []}))
+
+    app = _make_app(config)
+    app.router.add_get("/v1/observations", observations)
+    app.router.add_get("/v1/taxa", taxa_search)
+    return app
+
+async def start_standins(config: StandInConfig, host: str = "127.0.0.1", mapbox_port: int = 0, inaturalist_port: int = 0) -> dict:
+    """Starts both stand-ins and returns their runners and base URLs.
+
+    Port 0 picks free ports. The URLs are in the form MAPBOX_API_URL and
+    INATURALIST_API_URL expect.
+    """
+    standins = {}
+    for name, make_app, port, path in (
+        ("mapbox", make_mapbox_app, mapbox_port, ""),
+        ("inaturalist", make_inaturalist_app, inaturalist_port, "/v1"),
+    ):
+        runner = web.AppRunner(make_app(config), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        bound_host, bound_port = runner.addresses[0][:2]
+        standins[name] = {"runner": runner, "url": f"http://{bound_host}:{bound_port}{path}"}
+    return standins
+
+async def stop_standins(standins: dict):
+    for standin in standins.values():
+        await standin["runner"].cleanup()
+
+def standin_stats(standins: dict) -> dict:
+    """Requests served and throttled by each stand-in."""
+    return {name: dict(standin["runner"].app["counters"]) for name, standin in standins.items()}
+
+async def _serve(args):
+    config = StandInConfig(args.latency_ms, args.jitter_ms, args.throttle_rps, args.throttle_burst)
+    standins = await start_standins(config, args.host, args.mapbox_port, args.inaturalist_port)
+    print(f"MAPBOX_API_URL={standins['mapbox']['url']}")
+    print(f"INATURALIST_API_URL={standins['inaturalist']['url']}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_standins(standins)
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per upstream request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--throttle-rps", type=float, default=0.0, help="Requests per second before 429s (0 = off)")
+    parser.add_argument("--throttle-burst", type=float, default=10.0, help="Burst allowance for the throttle")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_standin_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--mapbox-port", type=int, default=8101)
+    parser.add_argument("--inaturalist-port", type=int, default=8102)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()